@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transport import boto3_config, configure_pools
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubS3Handler.lock:
+            StubS3Handler.connections += 1
+
+    def do_HEAD(self):
+        # Simulate service latency so that requests overlap
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def run(endpoint_url, pool_size, num_workers, requests_per_worker):
+    import boto3
+
+    configure_pools(num_workers, [("s3", pool_size)])
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        region_name="us-east-1",
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+        config=boto3_config("s3", s3={"addressing_style": "path"}),
+    )
+
+    def worker():
+        for index in range(requests_per_worker):
+            s3_client.head_object(Bucket="benchmark", Key=f"key-{index}")
+
+    StubS3Handler.connections = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for future in [executor.submit(worker) for _ in range(num_workers)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return num_workers * requests_per_worker / elapsed, StubS3Handler.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare requests/sec of boto3 clients with the default and "
+        "a worker-sized connection pool against a local stub endpoint"
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=os.cpu_count() * 4,
+        help="Number of concurrent worker threads",
+    )
+    parser.add_argument(
+        "--requests-per-worker", type=int, default=50, help="Requests per worker"
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=5.0, help="Simulated service latency"
+    )
+    args = parser.parse_args()
+
+    server = StubS3Server(("127.0.0.1", 0), StubS3Handler)
+    server.latency = args.latency_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{'pool size':>9} {'requests/s':>11} {'connections opened':>19}")
+    for pool_size in (10, args.num_workers):
+        requests_per_second, connections = run(
+            endpoint_url, pool_size, args.num_workers, args.requests_per_worker
+        )
+        print(f"{pool_size:>9} {requests_per_second:>11.0f} {connections:>19}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
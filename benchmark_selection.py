@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import string
+import time
+
+from selection import Selector
+
+
+def random_name(length=24):
+    return "".join(random.choices(string.ascii_lowercase + "-/", k=length))
+
+
+def naive_matches(name, prefixes):
+    return any(name.startswith(prefix) for prefix in prefixes)
+
+
+def mixed_pattern(index, prefix):
+    # A quarter of the patterns as globs and regexes, the rest as prefixes
+    if index % 8 == 0:
+        return f"glob:*{prefix}*"
+    if index % 8 == 1:
+        return f"re:{prefix}\\d+"
+    return prefix
+
+
+def time_per_item(match, names):
+    start = time.perf_counter()
+    for name in names:
+        match(name)
+    return (time.perf_counter() - start) / len(names) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure selection cost per item as the pattern count grows"
+    )
+    parser.add_argument("--items", type=int, default=200000, help="Names to match")
+    parser.add_argument(
+        "--pattern-counts",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000, 10000],
+        help="Numbers of include patterns to measure",
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    names = [random_name() for _ in range(args.items)]
+
+    print(f"{'patterns':>8} {'naive ns':>10} {'prefix ns':>10} {'mixed ns':>10}")
+    for count in args.pattern_counts:
+        prefixes = [random_name(random.randint(3, 8)) for _ in range(count)]
+        prefix_selector = Selector(prefixes, ["prefix:zz"])
+        mixed_selector = Selector(
+            [mixed_pattern(index, prefix) for index, prefix in enumerate(prefixes)],
+            ["prefix:zz"],
+        )
+        print(
+            f"{count:>8}"
+            f" {time_per_item(lambda name: naive_matches(name, prefixes), names):>10.0f}"
+            f" {time_per_item(prefix_selector, names):>10.0f}"
+            f" {time_per_item(mixed_selector, names):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+SCRIPTS = sorted(
+    path
+    for path in glob.glob(os.path.join(os.path.dirname(__file__) or ".", "*.py"))
+    if os.path.basename(path).startswith(
+        ("delete_", "export_", "import_", "multi_", "sweeper_")
+    )
+)
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | imported package";
+    # top-level imports are the ones whose name is not indented.
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            modules.append((int(cumulative), name.strip()))
+    return modules
+
+
+def measure(script):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script, "--help"],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    modules = parse_importtime(result.stderr)
+    import_ms = sum(cumulative for cumulative, _ in modules) / 1000
+    return wall_ms, import_ms, sorted(modules, reverse=True), result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure cold-start import cost of each script's --help"
+    )
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=100.0,
+        help="Fail when any script spends longer than this importing modules",
+    )
+    parser.add_argument(
+        "--top", type=int, default=3, help="Show this many heaviest imports"
+    )
+    parser.add_argument("scripts", nargs="*", default=SCRIPTS)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'script':<32} {'wall ms':>8} {'import ms':>10}  heaviest imports")
+    for script in args.scripts:
+        wall_ms, import_ms, modules, returncode = measure(script)
+        heaviest = ", ".join(
+            f"{name} {cumulative / 1000:.1f}ms"
+            for cumulative, name in modules[: args.top]
+        )
+        status = ""
+        if returncode != 0:
+            status = " FAILED"
+            failed = True
+        elif import_ms > args.max_import_ms:
+            status = " SLOW"
+            failed = True
+        print(
+            f"{os.path.basename(script):<32} {wall_ms:>8.1f} {import_ms:>10.1f}"
+            f"  {heaviest}{status}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,114 @@
-import boto3
+import threading
 
+from transport import boto3_config
 
-def ec2_client_iterator():
-    for region in boto3.client("ec2", region_name="us-east-1").describe_regions()[
-        "Regions"
-    ]:
-        yield boto3.client("ec2", region_name=region["RegionName"]), region[
-            "RegionName"
-        ]
+# boto3 is imported inside each function so that importing this module (and
+# running --help on the scripts using it) does not pay for loading the SDK.
+
+# Clients, region lists and assumed-role sessions are cached for the life of
+# the process; boto3 clients are thread-safe, so long-running callers keep
+# their connections and credentials warm.
+_clients = {}
+_region_names = {}
+_assumed_role_sessions = {}
+_cache_lock = threading.Lock()
 
 
-def s3_client_iterator():
-    yield boto3.client("s3")
+def create_client(session, service, region_name=None):
+    cache_key = (session, service, region_name)
+    with _cache_lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            client = session.client(
+                service, region_name=region_name, config=boto3_config(service)
+            )
+            _clients[cache_key] = client
+    return client
 
 
-def cloudtrail_client_iterator():
-    for region in boto3.client("ec2", region_name="us-east-1").describe_regions()[
-        "Regions"
-    ]:
-        yield boto3.client("cloudtrail", region_name=region["RegionName"]), region[
-            "RegionName"
+def region_names(session):
+    if session not in _region_names:
+        _region_names[session] = [
+            region["RegionName"]
+            for region in create_client(session, "ec2", "us-east-1").describe_regions()[
+                "Regions"
+            ]
         ]
+    return _region_names[session]
+
+
+def assumed_role_session(account_id, role_name, session_name="cloud-nuke"):
+    # The session's credentials are fetched from STS on first use and
+    # refreshed shortly before they expire, so long-running callers can keep
+    # the session (and the clients cached for it) indefinitely.
+    import boto3
+    import botocore.session
+    from botocore.credentials import (
+        AssumeRoleCredentialFetcher,
+        DeferredRefreshableCredentials,
+    )
+
+    cache_key = (account_id, role_name)
+    with _cache_lock:
+        session = _assumed_role_sessions.get(cache_key)
+        if session is None:
+            source_session = botocore.session.get_session()
+            fetcher = AssumeRoleCredentialFetcher(
+                source_session.create_client,
+                source_session.get_credentials(),
+                f"arn:aws:iam::{account_id}:role/{role_name}",
+                extra_args={"RoleSessionName": session_name},
+                expiry_window_seconds=5 * 60,
+            )
+            botocore_session = botocore.session.get_session()
+            # botocore has no public setter for a session's credentials, and
+            # boto3.Session only accepts static keys; assigning the private
+            # attribute is the usual way to attach refreshable ones.
+            # pylint: disable-next=protected-access
+            botocore_session._credentials = DeferredRefreshableCredentials(
+                refresh_using=fetcher.fetch_credentials, method="assume-role"
+            )
+            session = boto3.session.Session(botocore_session=botocore_session)
+            _assumed_role_sessions[cache_key] = session
+    return session
+
+
+def organization_account_ids(parent_id):
+    import boto3
+
+    organizations_client = create_client(boto3, "organizations")
+    account_ids = []
+    for page in organizations_client.get_paginator("list_accounts_for_parent").paginate(
+        ParentId=parent_id
+    ):
+        account_ids.extend(
+            account["Id"]
+            for account in page["Accounts"]
+            if account["Status"] == "ACTIVE"
+        )
+    for page in organizations_client.get_paginator(
+        "list_organizational_units_for_parent"
+    ).paginate(ParentId=parent_id):
+        for ou in page["OrganizationalUnits"]:
+            account_ids.extend(organization_account_ids(ou["Id"]))
+    return account_ids
+
+
+def ec2_client_iterator(session=None):
+    if session is None:
+        import boto3 as session
+    for region in region_names(session):
+        yield create_client(session, "ec2", region), region
+
+
+def s3_client_iterator(session=None):
+    if session is None:
+        import boto3 as session
+    yield create_client(session, "s3")
+
+
+def cloudtrail_client_iterator(session=None):
+    if session is None:
+        import boto3 as session
+    for region in region_names(session):
+        yield create_client(session, "cloudtrail", region), region
@@ -2,13 +2,14 @@
 import argparse
 
 from boto3_client import ec2_client_iterator
+from selection import add_selection_arguments, selector_from_args
 
 
 def list_amis(ec2_client, owner_id):
     return ec2_client.describe_images(Owners=[owner_id])["Images"]
 
 
-def delete_amis(ec2_client, region, amis, prefix, live_action=False):
+def delete_amis(ec2_client, region, amis, selector, live_action=False):
     if live_action:
         log = print
     else:
@@ -16,14 +17,17 @@ def delete_amis(ec2_client, region, amis, prefix, live_action=False):
         def log(text):
             return print(f"[DRYRUN] {text}")
 
+    matched = 0
     for ami in amis:
-        if ami["Name"].startswith(prefix):
+        if selector(ami["Name"]):
+            matched += 1
             log(f"{region}/{ami['Name']} {ami['Name']} Deleting ...")
             if live_action:
                 ec2_client.deregister_image(ImageId=ami["ImageId"])
         else:
             if live_action:
                 log(f"{region}/{ami['Name']} {ami['Name']} Skipping ...")
+    return matched
 
 
 def main():
@@ -32,19 +36,21 @@ def main():
     )
     parser.add_argument("owner_id", help="Owner ID of the AMIs")
     parser.add_argument("prefix", help="Prefix to check for in AMI names")
+    add_selection_arguments(parser)
     parser.add_argument(
         "--live-action",
         action="store_true",
         help="Perform live actions instead of dry run",
     )
     args = parser.parse_args()
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
 
     for ec2_client, region in ec2_client_iterator():
         delete_amis(
             ec2_client,
             region,
             list_amis(ec2_client, args.owner_id),
-            args.prefix,
+            selector,
             args.live_action,
         )
 
@@ -57,7 +63,7 @@ def main():
                     ec2_client,
                     region,
                     list_amis(ec2_client, args.owner_id),
-                    args.prefix,
+                    selector,
                     args.live_action,
                 )
 
@@ -1,9 +1,12 @@
 import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
-from boto3_client import cloudtrail_client_iterator
+from boto3_client import cloudtrail_client_iterator, create_client
+from selection import add_selection_arguments, selector_from_args
 
 
-def delete_cloudtrails(cloudtrail_client, region, prefix, live_action):
+def delete_cloudtrails(cloudtrail_client, region, selector, live_action):
     if live_action:
         log = print
     else:
@@ -16,9 +19,11 @@ def delete_cloudtrails(cloudtrail_client, region, prefix, live_action):
     trails = response.get("trailList", [])
 
     # Delete each trail
+    matched = 0
     for trail in trails:
         trail_name = trail["Name"]
-        if not prefix or trail_name.startswith(prefix):
+        if selector(trail_name):
+            matched += 1
             log(f"{region}/{trail_name} Deleting ...")
             if live_action:
                 try:
@@ -26,21 +31,182 @@ def delete_cloudtrails(cloudtrail_client, region, prefix, live_action):
                 except Exception as e:
                     print(e)
         else:
-            log(f"{region}/{trail_name} Skipping (Prefix does not match)...")
+            log(f"{region}/{trail_name} Skipping (Selection does not match)...")
+    return matched
+
+
+def list_home_trails(cloudtrail_client):
+    # Without shadow trails each region returns only the trails homed there,
+    # so multi-region and organization trails are listed exactly once.
+    response = cloudtrail_client.describe_trails(includeShadowTrails=False)
+    return response.get("trailList", [])
+
+
+def list_event_data_stores(cloudtrail_client):
+    event_data_stores = []
+    operation_parameters = {}
+    while True:
+        response = cloudtrail_client.list_event_data_stores(**operation_parameters)
+        event_data_stores.extend(response.get("EventDataStores", []))
+        if "NextToken" not in response:
+            return event_data_stores
+        operation_parameters["NextToken"] = response["NextToken"]
+
+
+def delete_trail(cloudtrail_client, trail, stop_logging):
+    if stop_logging:
+        cloudtrail_client.stop_logging(Name=trail["TrailARN"])
+    cloudtrail_client.delete_trail(Name=trail["TrailARN"])
+
+
+def delete_event_data_store(cloudtrail_client, event_data_store):
+    arn = event_data_store["EventDataStoreArn"]
+    cloudtrail_client.update_event_data_store(
+        EventDataStore=arn, TerminationProtectionEnabled=False
+    )
+    cloudtrail_client.delete_event_data_store(EventDataStore=arn)
+
+
+def delete_cloudtrails_global(
+    selector,
+    live_action,
+    num_workers,
+    stop_logging=False,
+    event_data_stores=False,
+    session=None,
+):
+    if live_action:
+        log = print
+    else:
+
+        def log(text):
+            return print(f"[DRYRUN] {text}")
+
+    if session is None:
+        import boto3 as session
+
+    clients = {
+        region: cloudtrail_client
+        for cloudtrail_client, region in cloudtrail_client_iterator(session)
+    }
+
+    def list_region(region):
+        # A failure to list one kind must not hide the other
+        trails, stores = [], []
+        try:
+            trails = list_home_trails(clients[region])
+        except Exception as e:
+            print(f"{region} Listing trails failed: {e}")
+        if event_data_stores:
+            try:
+                stores = list_event_data_stores(clients[region])
+            except Exception as e:
+                print(f"{region} Listing event data stores failed: {e}")
+        return trails, stores
+
+    def delete_in_home_region(kind, name, home_region, delete_func, *func_args):
+        log(f"{home_region}/{name} Deleting {kind} ...")
+        if not live_action:
+            return
+        try:
+            delete_func(create_client(session, "cloudtrail", home_region), *func_args)
+        except Exception as e:
+            print(f"{home_region}/{name} Deleting {kind} failed: {e}")
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        # Query every region concurrently, keeping one copy of each resource
+        trails = {}
+        stores = {}
+        for region_trails, region_stores in executor.map(list_region, clients):
+            for trail in region_trails:
+                trails.setdefault(trail["TrailARN"], trail)
+            for store in region_stores:
+                stores.setdefault(store["EventDataStoreArn"], store)
+
+        futures = []
+        for trail in trails.values():
+            if not selector(trail["Name"]):
+                log(
+                    f"{trail['HomeRegion']}/{trail['Name']} Skipping "
+                    "(Selection does not match)..."
+                )
+                continue
+            futures.append(
+                executor.submit(
+                    delete_in_home_region,
+                    "trail",
+                    trail["Name"],
+                    trail["HomeRegion"],
+                    delete_trail,
+                    trail,
+                    stop_logging,
+                )
+            )
+        for store in stores.values():
+            if not selector(store["Name"]):
+                continue
+            futures.append(
+                executor.submit(
+                    delete_in_home_region,
+                    "event data store",
+                    store["Name"],
+                    # arn:aws:cloudtrail:<region>:<account>:eventdatastore/<id>
+                    store["EventDataStoreArn"].split(":")[3],
+                    delete_event_data_store,
+                    store,
+                )
+            )
+        for future in futures:
+            future.result()
+
+    return len(futures)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Delete CloudTrail trails")
     parser.add_argument("--prefix", help="Prefix to check for in trail names")
+    add_selection_arguments(parser)
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker threads",
+    )
+    parser.add_argument(
+        "--stop-logging",
+        action="store_true",
+        help="Stop logging on each trail before deleting it",
+    )
+    parser.add_argument(
+        "--event-data-stores",
+        action="store_true",
+        help="Also delete matching CloudTrail Lake event data stores",
+    )
+    parser.add_argument(
+        "--per-region",
+        action="store_true",
+        help="Sweep each region separately, including shadow copies of trails",
+    )
     parser.add_argument(
         "--live-action",
         action="store_true",
         help="Perform live actions instead of dry run",
     )
     args = parser.parse_args()
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
 
-    for cloudtrail_client, region in cloudtrail_client_iterator():
-        delete_cloudtrails(cloudtrail_client, region, args.prefix, args.live_action)
+    if args.per_region:
+        for cloudtrail_client, region in cloudtrail_client_iterator():
+            delete_cloudtrails(cloudtrail_client, region, selector, args.live_action)
+        return
+
+    delete_cloudtrails_global(
+        selector,
+        args.live_action,
+        args.num_workers,
+        args.stop_logging,
+        args.event_data_stores,
+    )
 
 
 if __name__ == "__main__":
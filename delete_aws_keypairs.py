@@ -2,9 +2,10 @@
 import argparse
 
 from boto3_client import ec2_client_iterator
+from selection import add_selection_arguments, selector_from_args
 
 
-def delete_key_pairs(ec2_client, region, prefix, live_action):
+def delete_key_pairs(ec2_client, region, selector, live_action):
     if live_action:
         log = print
     else:
@@ -14,12 +15,15 @@ def delete_key_pairs(ec2_client, region, prefix, live_action):
 
     key_pairs = ec2_client.describe_key_pairs()["KeyPairs"]
 
+    matched = 0
     for key_pair in key_pairs:
         key_name = key_pair["KeyName"]
-        if key_name.startswith(prefix):
+        if selector(key_name):
+            matched += 1
             log(f"{region}/{key_name} Deleting Key Pair ...")
             if live_action:
                 ec2_client.delete_key_pair(KeyName=key_name)
+    return matched
 
 
 def main():
@@ -28,22 +32,24 @@ def main():
     )
     parser.add_argument("owner_id", help="Owner ID of the AMIs")
     parser.add_argument("prefix", help="Prefix to check for in AMI names")
+    add_selection_arguments(parser)
     parser.add_argument(
         "--live-action",
         action="store_true",
         help="Perform live actions instead of dry run",
     )
     args = parser.parse_args()
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
 
     for ec2_client, region in ec2_client_iterator():
-        delete_key_pairs(ec2_client, region, args.prefix, args.live_action)
+        delete_key_pairs(ec2_client, region, selector, args.live_action)
 
     if not args.live_action:
         rerun_live = input("Do you want to rerun in live mode? (Y/N): ").strip().lower()
         if rerun_live == "y":
             args.live_action = True
             for ec2_client, region in ec2_client_iterator():
-                delete_key_pairs(ec2_client, region, args.prefix, args.live_action)
+                delete_key_pairs(ec2_client, region, selector, args.live_action)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
-import boto3
+import argparse
+from datetime import datetime
+
+from boto3_client import create_client, region_names
+from inventory import Inventory
 
 
 def list_unused_snapshots(ec2_client):
@@ -35,12 +39,15 @@ def list_unused_snapshots(ec2_client):
 
 
 def delete_unused_snapshots(ec2_client, snapshot_ids):
+    deleted = []
     for snapshot_id in snapshot_ids:
         try:
             ec2_client.delete_snapshot(SnapshotId=snapshot_id)
             print(f"Snapshot {snapshot_id} deleted successfully.")
+            deleted.append(snapshot_id)
         except Exception as e:
             print(f"Error deleting snapshot {snapshot_id}: {e}")
+    return deleted
 
 
 def list_unused_volumes(ec2_client):
@@ -58,12 +65,15 @@ def list_unused_volumes(ec2_client):
 
 
 def delete_unused_volumes(ec2_client, volume_ids):
+    deleted = []
     for volume_id in volume_ids:
         try:
             ec2_client.delete_volume(VolumeId=volume_id)
             print(f"Volume {volume_id} deleted successfully.")
+            deleted.append(volume_id)
         except Exception as e:
             print(f"Error deleting volume {volume_id}: {e}")
+    return deleted
 
 
 def list_unused_eips(ec2_client):
@@ -81,12 +91,15 @@ def list_unused_eips(ec2_client):
 
 
 def delete_unused_eips(ec2_client, eip_ids):
+    deleted = []
     for eip_id in eip_ids:
         try:
             ec2_client.release_address(AllocationId=eip_id)
             print(f"Elastic IP {eip_id} released successfully.")
+            deleted.append(eip_id)
         except Exception as e:
             print(f"Error releasing Elastic IP {eip_id}: {e}")
+    return deleted
 
 
 def list_unused_placement_groups(ec2_client):
@@ -104,48 +117,229 @@ def list_unused_placement_groups(ec2_client):
 
 
 def delete_unused_placement_groups(ec2_client, placement_groups):
+    deleted = []
     for pg_name in placement_groups:
         try:
             ec2_client.delete_placement_group(GroupName=pg_name)
             print(f"Placement group {pg_name} deleted successfully.")
+            deleted.append(pg_name)
         except Exception as e:
             print(f"Error deleting placement group {pg_name}: {e}")
+    return deleted
+
+
+def to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.timestamp()
+
+
+def scan_images(ec2_client):
+    response = ec2_client.describe_images(
+        Filters=[{"Name": "is-public", "Values": ["False"]}]
+    )
+    return [
+        {
+            "id": image["ImageId"],
+            "name": image.get("Name"),
+            "state": image.get("State"),
+            "created_at": to_timestamp(image.get("CreationDate")),
+            "refs": [
+                block_device_mapping["Ebs"]["SnapshotId"]
+                for block_device_mapping in image.get("BlockDeviceMappings", [])
+                if "SnapshotId" in block_device_mapping.get("Ebs", {})
+            ],
+        }
+        for image in response["Images"]
+    ]
 
 
-def delete_aws_resources():
-    # Create a Boto3 client for EC2
-    ec2_client = boto3.client("ec2", region_name="us-east-1")
+def scan_snapshots(ec2_client):
+    response = ec2_client.describe_snapshots(OwnerIds=["self"])
+    return [
+        {
+            "id": snapshot["SnapshotId"],
+            "state": snapshot.get("State"),
+            "created_at": to_timestamp(snapshot.get("StartTime")),
+            "attributes": {"VolumeId": snapshot.get("VolumeId")},
+        }
+        for snapshot in response["Snapshots"]
+    ]
 
-    # Get all AWS regions
-    regions = [
-        region["RegionName"] for region in ec2_client.describe_regions()["Regions"]
+
+def scan_volumes(ec2_client):
+    response = ec2_client.describe_volumes()
+    return [
+        {
+            "id": volume["VolumeId"],
+            "state": "attached" if volume.get("Attachments") else "unattached",
+            "created_at": to_timestamp(volume.get("CreateTime")),
+        }
+        for volume in response["Volumes"]
     ]
 
+
+def scan_eips(ec2_client):
+    response = ec2_client.describe_addresses()
+    return [
+        {
+            "id": eip["AllocationId"],
+            "state": (
+                "associated"
+                if eip.get("InstanceId") or eip.get("NetworkInterfaceId")
+                else "unassociated"
+            ),
+            "attributes": {"PublicIp": eip.get("PublicIp")},
+        }
+        for eip in response["Addresses"]
+    ]
+
+
+def scan_placement_groups(ec2_client):
+    response = ec2_client.describe_placement_groups()
+    return [
+        {"id": pg["GroupName"], "name": pg["GroupName"], "state": pg["State"]}
+        for pg in response["PlacementGroups"]
+    ]
+
+
+INVENTORY_SCANS = {
+    "image": scan_images,
+    "snapshot": scan_snapshots,
+    "volume": scan_volumes,
+    "eip": scan_eips,
+    "placement_group": scan_placement_groups,
+}
+
+# State recorded by the scan functions above that marks a resource as unused
+UNUSED_STATES = {
+    "volume": "unattached",
+    "eip": "unassociated",
+    "placement_group": "available",
+}
+
+
+def refresh_inventory(inventory, account, region, ec2_client, resource_type, max_age):
+    if inventory.is_fresh(account, region, resource_type, max_age):
+        print(f"Using inventory for {resource_type} in region: {region}")
+        return
+    resources = INVENTORY_SCANS[resource_type](ec2_client)
+    new_ids = inventory.record_scan(account, region, resource_type, resources)
+    print(
+        f"Scanned {len(resources)} {resource_type}(s) in region {region}, "
+        f"{len(new_ids)} new since last scan"
+    )
+
+
+def list_unused_from_inventory(
+    inventory, account, region, ec2_client, resource_type, max_age
+):
+    try:
+        if resource_type == "snapshot":
+            # Snapshots are referenced by images, so both tables must be current
+            refresh_inventory(inventory, account, region, ec2_client, "image", max_age)
+            refresh_inventory(
+                inventory, account, region, ec2_client, "snapshot", max_age
+            )
+            return inventory.unreferenced_ids(account, region, "snapshot")
+        refresh_inventory(
+            inventory, account, region, ec2_client, resource_type, max_age
+        )
+        return inventory.resource_ids(
+            account, region, resource_type, UNUSED_STATES[resource_type]
+        )
+    except Exception as e:
+        print(f"Error listing unused {resource_type}s from inventory: {e}")
+        return []
+
+
+def delete_aws_resources(inventory=None, inventory_max_age=0, session=None):
+    if session is None:
+        import boto3 as session
+
+    account = None
+    if inventory is not None:
+        account = create_client(session, "sts").get_caller_identity()["Account"]
+
+    # Ids of everything deleted, returned as the sweep's count
+    deleted = []
+
+    def list_unused(ec2_client, region, resource_type, list_func):
+        if inventory is None:
+            return list_func(ec2_client)
+        return list_unused_from_inventory(
+            inventory, account, region, ec2_client, resource_type, inventory_max_age
+        )
+
+    def record_deleted(region, resource_type, resource_ids):
+        deleted.extend(resource_ids)
+        if inventory is None:
+            return
+        for resource_id in resource_ids:
+            inventory.record_action(
+                account, region, resource_type, resource_id, "deleted"
+            )
+
+    # Get all AWS regions
+    regions = region_names(session)
+
     # Iterate through each region
     for region in regions:
 
         # Create a Boto3 client for EC2 in the current region
-        ec2_client = boto3.client("ec2", region_name=region)
+        ec2_client = create_client(session, "ec2", region)
 
         print(f"Deleting unused snapshots in region: {region}")
-        delete_unused_snapshots(ec2_client, list_unused_snapshots(ec2_client))
+        record_deleted(
+            region,
+            "snapshot",
+            delete_unused_snapshots(
+                ec2_client,
+                list_unused(ec2_client, region, "snapshot", list_unused_snapshots),
+            ),
+        )
 
     # Iterate through each region
     for region in regions:
 
         # Create a Boto3 client for EC2 in the current region
-        ec2_client = boto3.client("ec2", region_name=region)
+        ec2_client = create_client(session, "ec2", region)
 
         print(f"Deleting unused Placement Groups in region: {region}")
-        delete_unused_placement_groups(
-            ec2_client, list_unused_placement_groups(ec2_client)
+        record_deleted(
+            region,
+            "placement_group",
+            delete_unused_placement_groups(
+                ec2_client,
+                list_unused(
+                    ec2_client,
+                    region,
+                    "placement_group",
+                    list_unused_placement_groups,
+                ),
+            ),
         )
 
         print(f"Deleting unused EIPs in region: {region}")
-        delete_unused_eips(ec2_client, list_unused_eips(ec2_client))
+        record_deleted(
+            region,
+            "eip",
+            delete_unused_eips(
+                ec2_client, list_unused(ec2_client, region, "eip", list_unused_eips)
+            ),
+        )
 
         print(f"Deleting unused volumes in region: {region}")
-        delete_unused_volumes(ec2_client, list_unused_volumes(ec2_client))
+        record_deleted(
+            region,
+            "volume",
+            delete_unused_volumes(
+                ec2_client,
+                list_unused(ec2_client, region, "volume", list_unused_volumes),
+            ),
+        )
 
         print(f"Deleting VPN connections in region: {region}")
         vpn_connections = ec2_client.describe_vpn_connections()["VpnConnections"]
@@ -158,6 +352,7 @@ def delete_aws_resources():
             print(f"Deleting VPN connection {vpn_connection_id} in region {region}")
             try:
                 ec2_client.delete_vpn_connection(VpnConnectionId=vpn_connection_id)
+                deleted.append(vpn_connection_id)
             except Exception as e:
                 print(e)
 
@@ -179,6 +374,7 @@ def delete_aws_resources():
                 ec2_client.delete_vpc_peering_connection(
                     VpcPeeringConnectionId=peering_connection_id
                 )
+                deleted.append(peering_connection_id)
             except Exception as e:
                 print(e)
 
@@ -196,6 +392,7 @@ def delete_aws_resources():
                 ec2_client.delete_transit_gateway_vpc_attachment(
                     TransitGatewayAttachmentId=attachment_id
                 )
+                deleted.append(attachment_id)
             except Exception as e:
                 print(e)
         try:
@@ -203,6 +400,7 @@ def delete_aws_resources():
             for vgw_id in [vgw["VpnGatewayId"] for vgw in response["VpnGateways"]]:
                 try:
                     ec2_client.delete_vpn_gateway(VpnGatewayId=vgw_id)
+                    deleted.append(vgw_id)
                     print(f"Virtual Private Gateway {vgw_id} deleted successfully.")
                 except Exception as e:
                     print(f"Error deleting Virtual Private Gateway {vgw_id}: {e}")
@@ -220,6 +418,7 @@ def delete_aws_resources():
             print(f"Deleting transit gateway with ID: {gateway_id}")
             try:
                 ec2_client.delete_transit_gateway(TransitGatewayId=gateway_id)
+                deleted.append(gateway_id)
             except Exception as e:
                 print(e)
 
@@ -232,6 +431,7 @@ def delete_aws_resources():
             print(f"Deleting VPC with ID: {vpc_id}")
             try:
                 ec2_client.delete_vpc(VpcId=vpc_id)
+                deleted.append(vpc_id)
             except Exception as e:
                 print(e)
     # Iterate through each region
@@ -239,7 +439,7 @@ def delete_aws_resources():
         print(f"Deleting RDS instances in region: {region}")
 
         # Create a Boto3 client for RDS in the current region
-        rds_client = boto3.client("rds", region_name=region)
+        rds_client = create_client(session, "rds", region)
 
         # Fetching IDs of all RDS instances in the current region
         response = rds_client.describe_db_instances()
@@ -253,7 +453,33 @@ def delete_aws_resources():
             rds_client.delete_db_instance(
                 DBInstanceIdentifier=instance_identifier, SkipFinalSnapshot=True
             )
+            deleted.append(instance_identifier)
+
+    return len(deleted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete unused AWS resources")
+    parser.add_argument(
+        "--inventory",
+        help="Path of a local SQLite inventory to record scans and actions in",
+    )
+    parser.add_argument(
+        "--inventory-max-age",
+        type=int,
+        default=0,
+        help="Reuse inventory scans younger than this many seconds instead of "
+        "calling the describe APIs again",
+    )
+    args = parser.parse_args()
+
+    inventory = Inventory(args.inventory) if args.inventory else None
+    try:
+        delete_aws_resources(inventory, args.inventory_max_age)
+    finally:
+        if inventory is not None:
+            inventory.close()
 
 
 if __name__ == "__main__":
-    delete_aws_resources()
+    main()
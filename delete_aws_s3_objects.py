@@ -1,60 +1,362 @@
 import argparse
+import json
 import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 
 from boto3_client import s3_client_iterator
+from s3_inventory import iter_inventory_chunks, source_bucket
+from selection import add_selection_arguments, selector_from_args
+from transport import add_pool_arguments, configure_pools
 
+MAX_SPLIT_DISCOVERY_DEPTH = 3
 
-def delete_objects(s3_client, bucket_name, prefix, live_action, num_workers):
-    if live_action:
-        log = print
-    else:
 
-        def log(text):
-            return print(f"[DRYRUN] {text}")
+def key_before(key):
+    # A key sorting just below `key`, so StartAfter=key_before(key) includes key
+    if ord(key[-1]) == 0:
+        return key[:-1]
+    return key[:-1] + chr(ord(key[-1]) - 1) + "\U0010ffff"
+
 
+def discover_split_points(s3_client, bucket_name, prefix, shards):
+    # Walk "/"-delimited prefixes until there are enough to split the key space
+    # into `shards` ranges. Ranges are contiguous, so the split points only
+    # affect balance, never which keys get listed.
     paginator = s3_client.get_paginator("list_objects_v2")
-    operation_parameters = {"Bucket": bucket_name}
-    page_iterator = paginator.paginate(**operation_parameters)
-
-    def delete_object(key):
-        if not prefix or obj["Key"].startswith(prefix):
-            log(f"{bucket_name}/{key} Deleting object ...")
-            if live_action:
-                s3_client.delete_object(Bucket=bucket_name, Key=key)
-            else:
-                log(
-                    f"{bucket_name}/{obj['Key']} Skipping object (Prefix does not match) ..."
+    prefixes = [prefix or ""]
+    for _ in range(MAX_SPLIT_DISCOVERY_DEPTH):
+        discovered = []
+        for parent in prefixes:
+            for page in paginator.paginate(
+                Bucket=bucket_name, Prefix=parent, Delimiter="/"
+            ):
+                discovered.extend(
+                    common_prefix["Prefix"]
+                    for common_prefix in page.get("CommonPrefixes", [])
                 )
+        if not discovered:
+            break
+        prefixes = sorted(discovered)
+        if len(prefixes) >= shards:
+            break
+    if prefixes == [prefix or ""]:
+        print(
+            f"{bucket_name} No '/' prefixes under '{prefix or ''}' to split on, "
+            "listing it as a single range"
+        )
+        return []
+    split_points = sorted(
+        {prefixes[len(prefixes) * index // shards] for index in range(1, shards)}
+    )
+    if len(split_points) + 1 < shards:
+        print(
+            f"{bucket_name} Only found {len(prefixes)} prefix(es), listing "
+            f"{len(split_points) + 1} of {shards} ranges"
+        )
+    return split_points
+
+
+def write_split_points(s3_client, selector, shards, path):
+    # Discovery runs once and its output is handed to every node, since
+    # listings taken at different times can disagree on the split points.
+    split_points = {
+        bucket["Name"]: discover_split_points(
+            s3_client, bucket["Name"], selector.list_prefix, shards
+        )
+        for bucket in s3_client.list_buckets()["Buckets"]
+    }
+    with open(path, "w") as split_points_file:
+        json.dump(split_points, split_points_file, indent=2)
+
+
+def iter_key_range_pages(s3_client, bucket_name, selector, lower, upper):
+    paginator = s3_client.get_paginator("list_objects_v2")
+    operation_parameters = {"Bucket": bucket_name}
+    if selector.list_prefix:
+        operation_parameters["Prefix"] = selector.list_prefix
+    if lower:
+        operation_parameters["StartAfter"] = key_before(lower)
+    for page in paginator.paginate(**operation_parameters):
+        objects = []
+        for obj in page.get("Contents", []):
+            if upper and obj["Key"] >= upper:
+                if objects:
+                    yield objects
+                return
+            if selector(obj["Key"]):
+                objects.append({"Key": obj["Key"]})
+        if objects:
+            yield objects
+
 
+def delete_objects(
+    s3_client,
+    bucket_name,
+    selector,
+    live_action,
+    num_workers,
+    shards=1,
+    node_index=0,
+    node_count=1,
+    split_points=None,
+):
+    deleted = 0
     try:
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            futures = []
-            for page in page_iterator:
-                for obj in page["Contents"]:
-                    futures.append(executor.submit(delete_object, obj["Key"]))
+        if split_points is None:
+            split_points = []
+            if shards > 1:
+                split_points = discover_split_points(
+                    s3_client, bucket_name, selector.list_prefix, shards
+                )
+        bounds = [None] + split_points + [None]
+        key_ranges = [
+            (bounds[index], bounds[index + 1])
+            for index in range(len(bounds) - 1)
+            if index % node_count == node_index
+        ]
+
+        # Each key range is listed by its own thread and feeds its own share
+        # of the delete workers. Listers and delete workers together stay
+        # within num_workers, which is what the S3 connection pool is sized
+        # for; surplus ranges wait for a free lister.
+        listers = max(1, min(len(key_ranges), num_workers // 2))
+        workers_per_range = max(1, (num_workers - listers) // listers)
+        with ThreadPoolExecutor(max_workers=listers) as executor:
+            futures = [
+                executor.submit(
+                    delete_key_batches,
+                    s3_client,
+                    bucket_name,
+                    iter_key_range_pages(
+                        s3_client, bucket_name, selector, lower, upper
+                    ),
+                    live_action,
+                    workers_per_range,
+                )
+                for lower, upper in key_ranges
+            ]
             for future in futures:
-                future.result()
+                deleted += future.result()
 
     except Exception as e:
         print(e)
 
+    if not live_action:
+        return deleted
     try:
         response = s3_client.list_objects_v2(Bucket=bucket_name)
         if "Contents" not in response or not response["Contents"]:
             s3_client.delete_bucket(Bucket=bucket_name)
     except Exception as e:
         print(e)
+    return deleted
+
+
+def delete_key_batches(s3_client, bucket_name, batches, live_action, num_workers):
+    if live_action:
+        log = print
+    else:
+
+        def log(text):
+            return print(f"[DRYRUN] {text}")
+
+    def delete_batch(objects):
+        log(f"{bucket_name} Deleting {len(objects)} objects ...")
+        if not live_action:
+            for obj in objects:
+                version = f" (version {obj['VersionId']})" if "VersionId" in obj else ""
+                log(f"{bucket_name}/{obj['Key']}{version} Deleting object ...")
+            return
+        response = s3_client.delete_objects(
+            Bucket=bucket_name, Delete={"Objects": objects, "Quiet": True}
+        )
+        for error in response.get("Errors", []):
+            print(f"{bucket_name}/{error['Key']} {error['Code']}: {error['Message']}")
+
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = []
+        for objects in batches:
+            deleted += len(objects)
+            futures.append(executor.submit(delete_batch, objects))
+            # Keep memory bounded when the batches come from a huge listing
+            if len(futures) >= num_workers * 2:
+                for future in futures:
+                    future.result()
+                futures = []
+        for future in futures:
+            future.result()
+    return deleted
+
+
+def delete_objects_from_inventory(
+    s3_client, manifest_location, selector, older_than_days, live_action, num_workers
+):
+    bucket_name = source_bucket(manifest_location, s3_client)
+    try:
+        return delete_key_batches(
+            s3_client,
+            bucket_name,
+            iter_inventory_chunks(
+                manifest_location, selector, older_than_days, s3_client
+            ),
+            live_action,
+            num_workers,
+        )
+    except Exception as e:
+        print(e)
+        return 0
+
+
+LIFECYCLE_RULE_ID = "cloud-nuke-expire"
+
 
+def get_lifecycle_rules(s3_client, bucket_name):
+    from botocore.exceptions import ClientError
+
+    try:
+        response = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchLifecycleConfiguration":
+            return []
+        raise
+    return response["Rules"]
+
+
+def expiration_rules(prefix):
+    # Expiration by age and cleanup of expired delete markers cannot share one
+    # Expiration element, hence two rules over the same filter.
+    rule_id = f"{LIFECYCLE_RULE_ID}-{prefix}" if prefix else LIFECYCLE_RULE_ID
+    rule_filter = {"Prefix": prefix or ""}
+    return [
+        {
+            "ID": rule_id,
+            "Filter": rule_filter,
+            "Status": "Enabled",
+            "Expiration": {"Days": 1},
+            "NoncurrentVersionExpiration": {"NoncurrentDays": 1},
+            "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": 1},
+        },
+        {
+            "ID": f"{rule_id}-delete-markers",
+            "Filter": rule_filter,
+            "Status": "Enabled",
+            "Expiration": {"ExpiredObjectDeleteMarker": True},
+        },
+    ]
+
+
+def offload_to_lifecycle(s3_client, bucket_name, selector, live_action):
+    if live_action:
+        log = print
+    else:
+
+        def log(text):
+            return print(f"[DRYRUN] {text}")
 
-def delete_buckets(s3_client, prefix, live_action, num_workers):
+    prefixes = selector.literal_prefixes()
+    if prefixes is None:
+        print(
+            f"{bucket_name} Lifecycle offload only supports plain prefix "
+            "includes without excludes"
+        )
+        return 0
+
+    try:
+        new_rules = [rule for prefix in prefixes for rule in expiration_rules(prefix)]
+        new_rule_ids = {rule["ID"] for rule in new_rules}
+        rules = [
+            rule
+            for rule in get_lifecycle_rules(s3_client, bucket_name)
+            if rule.get("ID") not in new_rule_ids
+        ]
+        log(
+            f"{bucket_name} Installing lifecycle expiration for prefixes "
+            f"{prefixes} alongside {len(rules)} existing rule(s) ..."
+        )
+        if live_action:
+            s3_client.put_bucket_lifecycle_configuration(
+                Bucket=bucket_name,
+                LifecycleConfiguration={"Rules": rules + new_rules},
+            )
+        return len(prefixes)
+    except Exception as e:
+        print(e)
+        return 0
+
+
+def finalize_offloaded_bucket(s3_client, bucket_name, live_action):
+    if live_action:
+        log = print
+    else:
+
+        def log(text):
+            return print(f"[DRYRUN] {text}")
+
+    try:
+        # Only remove buckets that an earlier offload pass handed to S3
+        rules = get_lifecycle_rules(s3_client, bucket_name)
+        if not any(rule.get("ID", "").startswith(LIFECYCLE_RULE_ID) for rule in rules):
+            return 0
+
+        versions = s3_client.list_object_versions(Bucket=bucket_name, MaxKeys=1)
+        uploads = s3_client.list_multipart_uploads(Bucket=bucket_name, MaxUploads=1)
+        if (
+            versions.get("Versions")
+            or versions.get("DeleteMarkers")
+            or uploads.get("Uploads")
+        ):
+            log(f"{bucket_name} Skipping bucket (lifecycle expiration pending) ...")
+            return 0
+
+        log(f"{bucket_name} Deleting empty bucket ...")
+        if live_action:
+            s3_client.delete_bucket(Bucket=bucket_name)
+        return 1
+    except Exception as e:
+        print(e)
+        return 0
+
+
+def delete_buckets(
+    s3_client,
+    selector,
+    live_action,
+    num_workers,
+    lifecycle_offload=False,
+    finalize=False,
+    shards=1,
+    node_index=0,
+    node_count=1,
+    split_points=None,
+):
     # Retrieve bucket names
     response = s3_client.list_buckets()
     buckets = [bucket["Name"] for bucket in response["Buckets"]]
 
-    # Delete objects in each bucket
+    # Delete objects in each bucket, counting the keys (or, when offloading,
+    # the prefixes and buckets) that matched the selection
+    matched = 0
     for bucket_name in buckets:
-        delete_objects(s3_client, bucket_name, prefix, live_action, num_workers)
+        if finalize:
+            matched += finalize_offloaded_bucket(s3_client, bucket_name, live_action)
+        elif lifecycle_offload:
+            matched += offload_to_lifecycle(
+                s3_client, bucket_name, selector, live_action
+            )
+        else:
+            matched += delete_objects(
+                s3_client,
+                bucket_name,
+                selector,
+                live_action,
+                num_workers,
+                shards,
+                node_index,
+                node_count,
+                None if split_points is None else split_points.get(bucket_name, []),
+            )
+    return matched
 
 
 def main():
@@ -66,15 +368,107 @@ def main():
         help="Number of worker threads",
     )
     parser.add_argument("--prefix", help="Prefix to check for in object names")
+    add_selection_arguments(parser)
+    add_pool_arguments(parser)
     parser.add_argument(
         "--live-action",
         action="store_true",
         help="Perform live actions instead of dry run",
     )
+    parser.add_argument(
+        "--inventory-manifest",
+        help="Local path or s3:// URI of an S3 Inventory manifest.json to take "
+        "the object list from instead of listing the bucket",
+    )
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        help="Only delete inventory objects last modified more than this many "
+        "days ago",
+    )
+    parser.add_argument(
+        "--lifecycle-offload",
+        action="store_true",
+        help="Install lifecycle rules that expire the selected objects instead "
+        "of deleting them",
+    )
+    parser.add_argument(
+        "--finalize",
+        action="store_true",
+        help="Delete buckets emptied by an earlier --lifecycle-offload pass",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split each bucket's key space into this many ranges listed "
+        "concurrently",
+    )
+    parser.add_argument(
+        "--node-count",
+        type=int,
+        default=1,
+        help="Number of machines sharing the shards",
+    )
+    parser.add_argument(
+        "--node-index",
+        type=int,
+        default=0,
+        help="Index of this machine; it handles shards where "
+        "shard %% node-count == node-index",
+    )
+    parser.add_argument(
+        "--split-points-file",
+        help="JSON file mapping bucket names to the keys their shards start "
+        "at, as written by --discover-split-points. Required with "
+        "--node-count above 1 so that every machine uses the same ranges",
+    )
+    parser.add_argument(
+        "--discover-split-points",
+        action="store_true",
+        help="Only discover --shards ranges for each bucket and write them to "
+        "--split-points-file",
+    )
     args = parser.parse_args()
+    if args.discover_split_points and not args.split_points_file:
+        parser.error("--discover-split-points requires --split-points-file")
+    if not 0 <= args.node_index < args.node_count:
+        parser.error("--node-index must be at least 0 and below --node-count")
+    if args.node_count > 1 and not args.split_points_file:
+        parser.error("--node-count above 1 requires --split-points-file")
+    configure_pools(args.num_workers, args.pool_limit)
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
+
+    split_points = None
+    if args.split_points_file and not args.discover_split_points:
+        with open(args.split_points_file) as split_points_file:
+            split_points = json.load(split_points_file)
 
     for s3_client in s3_client_iterator():
-        delete_buckets(s3_client, args.prefix, args.live_action, args.num_workers)
+        if args.discover_split_points:
+            write_split_points(s3_client, selector, args.shards, args.split_points_file)
+        elif args.inventory_manifest:
+            delete_objects_from_inventory(
+                s3_client,
+                args.inventory_manifest,
+                selector,
+                args.older_than_days,
+                args.live_action,
+                args.num_workers,
+            )
+        else:
+            delete_buckets(
+                s3_client,
+                selector,
+                args.live_action,
+                args.num_workers,
+                args.lifecycle_offload,
+                args.finalize,
+                args.shards,
+                args.node_index,
+                args.node_count,
+                split_points,
+            )
 
 
 if __name__ == "__main__":
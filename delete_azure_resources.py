@@ -1,13 +1,20 @@
 import argparse
 import multiprocessing
+import time
 from concurrent.futures import ThreadPoolExecutor
 
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.recoveryservices import RecoveryServicesClient
-from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.resource.locks import ManagementLockClient
-from azure.mgmt.network import NetworkManagementClient
-from azure.core.exceptions import HttpResponseError
+from selection import add_selection_arguments, selector_from_args
+from transport import add_pool_arguments, azure_transport, configure_pools
+
+# Resource types ARM may force-delete, skipping graceful shutdown
+FORCE_DELETION_TYPES = (
+    "Microsoft.Compute/virtualMachines,Microsoft.Compute/virtualMachineScaleSets"
+)
+
+# Backup item undeletes and deletes are accepted and then run in the
+# background, so the vault is polled until they have finished
+BACKUP_ITEM_POLL_SECONDS = 15
+BACKUP_ITEM_TIMEOUT_SECONDS = 30 * 60
 
 
 def check_resource_group_lock(lock_client, resource_group, log):
@@ -26,6 +33,8 @@ def check_resource_group_lock(lock_client, resource_group, log):
 def delete_resource_group(
     resource_client, recovery_client, network_client, resource_group, log
 ):
+    from azure.core.exceptions import HttpResponseError
+
     for nsg in network_client.network_security_groups.list(resource_group.name):
         print(f"Deleting network security group '{nsg.name}'...")
         try:
@@ -40,18 +49,7 @@ def delete_resource_group(
         recovery_client.vaults.list_by_resource_group(resource_group.name)
     )
     for vault in recovery_vaults:
-        log(
-            f"Deleting recovery vault {vault.name} in resource group {resource_group.name}"
-        )
-        try:
-            recovery_client.vaults.delete(resource_group.name, vault.name)
-            log(
-                f"Deleted recovery vault {vault.name} in resource group {resource_group.name} successfully"
-            )
-        except Exception as e:
-            log(
-                f"Deleting recovery vault {vault.name} in resource group {resource_group.name} failed: {str(e)}"
-            )
+        delete_recovery_vault(recovery_client, None, resource_group, vault, log)
 
     log(f"Deleting resource group {resource_group.name}")
     try:
@@ -64,6 +62,148 @@ def delete_resource_group(
         log(f"Deleting resource group {resource_group.name} failed: {str(e)}")
 
 
+def parse_protected_item_id(item_id):
+    # .../backupFabrics/{fabric}/protectionContainers/{container}/protectedItems/{item}
+    segments = item_id.strip("/").split("/")
+    names = dict(zip(segments[::2], segments[1::2]))
+    return (
+        names["backupFabrics"],
+        names["protectionContainers"],
+        names["protectedItems"],
+    )
+
+
+def wait_for_backup_items(backup_client, resource_group, vault, pending, action, log):
+    deadline = time.monotonic() + BACKUP_ITEM_TIMEOUT_SECONDS
+    while True:
+        items = [
+            item
+            for item in backup_client.backup_protected_items.list(
+                vault.name, resource_group.name
+            )
+            if pending(item)
+        ]
+        if not items:
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(
+                f"{len(items)} backup item(s) in recovery vault {vault.name} "
+                f"still waiting to be {action}"
+            )
+        log(
+            f"Waiting for {len(items)} backup item(s) in recovery vault "
+            f"{vault.name} to be {action}"
+        )
+        time.sleep(BACKUP_ITEM_POLL_SECONDS)
+
+
+def delete_backup_items(backup_client, resource_group, vault, log):
+    from azure.mgmt.recoveryservicesbackup.activestamp.models import (
+        BackupResourceVaultConfig,
+        BackupResourceVaultConfigResource,
+        ProtectedItemResource,
+    )
+
+    # Soft-deleted backup items would keep the vault alive for two weeks
+    backup_client.backup_resource_vault_configs.update(
+        vault.name,
+        resource_group.name,
+        BackupResourceVaultConfigResource(
+            properties=BackupResourceVaultConfig(soft_delete_feature_state="Disabled")
+        ),
+    )
+
+    # Items deleted before soft delete was disabled stay soft-deleted; they
+    # have to be undeleted before a delete can remove them for good
+    for item in backup_client.backup_protected_items.list(
+        vault.name, resource_group.name
+    ):
+        if not item.properties.is_scheduled_for_deferred_delete:
+            continue
+        fabric_name, container_name, item_name = parse_protected_item_id(item.id)
+        log(f"Undeleting backup item {item_name} in recovery vault {vault.name}")
+        item.properties.is_rehydrate = True
+        backup_client.protected_items.create_or_update(
+            vault.name,
+            resource_group.name,
+            fabric_name,
+            container_name,
+            item_name,
+            ProtectedItemResource(properties=item.properties),
+        )
+    wait_for_backup_items(
+        backup_client,
+        resource_group,
+        vault,
+        lambda item: item.properties.is_scheduled_for_deferred_delete,
+        "undeleted",
+        log,
+    )
+
+    for item in backup_client.backup_protected_items.list(
+        vault.name, resource_group.name
+    ):
+        fabric_name, container_name, item_name = parse_protected_item_id(item.id)
+        log(f"Deleting backup item {item_name} in recovery vault {vault.name}")
+        backup_client.protected_items.delete(
+            vault.name, resource_group.name, fabric_name, container_name, item_name
+        )
+    # The vault delete fails while any backup item remains
+    wait_for_backup_items(
+        backup_client, resource_group, vault, lambda item: True, "deleted", log
+    )
+
+
+def delete_recovery_vault(recovery_client, backup_client, resource_group, vault, log):
+    log(f"Deleting recovery vault {vault.name} in resource group {resource_group.name}")
+    try:
+        if backup_client is not None:
+            delete_backup_items(backup_client, resource_group, vault, log)
+        recovery_client.vaults.delete(resource_group.name, vault.name)
+        log(
+            f"Deleted recovery vault {vault.name} in resource group {resource_group.name} successfully"
+        )
+    except Exception as e:
+        log(
+            f"Deleting recovery vault {vault.name} in resource group {resource_group.name} failed: {str(e)}"
+        )
+
+
+def delete_resource_group_fast(
+    resource_client, recovery_client, backup_client, resource_group, log
+):
+    # Only recovery vaults block the resource group delete; everything else,
+    # NSGs included, goes with the group. VMs and scale sets are force-deleted
+    # so the group takes as long as its slowest resource.
+    recovery_vaults = list(
+        recovery_client.vaults.list_by_resource_group(resource_group.name)
+    )
+    if recovery_vaults:
+        with ThreadPoolExecutor(max_workers=len(recovery_vaults)) as executor:
+            futures = [
+                executor.submit(
+                    delete_recovery_vault,
+                    recovery_client,
+                    backup_client,
+                    resource_group,
+                    vault,
+                    log,
+                )
+                for vault in recovery_vaults
+            ]
+            for future in futures:
+                future.result()
+
+    log(f"Deleting resource group {resource_group.name} with forced deletion")
+    try:
+        resource_client.resource_groups.begin_delete(
+            resource_group.name, force_deletion_types=FORCE_DELETION_TYPES
+        ).wait()
+        log(f"Deleted resource group {resource_group.name} successfully")
+    except Exception as e:
+        log(f"Deleting resource group {resource_group.name} failed: {str(e)}")
+
+
 def delete_resource_groups(
     resource_client,
     lock_client,
@@ -71,7 +211,9 @@ def delete_resource_groups(
     network_client,
     live_action,
     num_workers,
-    prefix,
+    selector,
+    backup_client=None,
+    fast_path=False,
 ):
     resource_groups = list(resource_client.resource_groups.list())
     if live_action:
@@ -81,12 +223,15 @@ def delete_resource_groups(
         def log(text):
             return print(f"[DRYRUN] {text}")
 
+    # Groups that match the selection and are not locked, counted in dry
+    # runs too
+    matched = 0
     with ThreadPoolExecutor(max_workers=num_workers) as executor:
         filtered_resource_groups = []
         for resource_group in resource_groups:
-            if prefix is not None and not resource_group.name.startswith(prefix):
+            if not selector(resource_group.name):
                 log(
-                    f"Skipping resource group {resource_group.name} not starting with {prefix}."
+                    f"Skipping resource group {resource_group.name} not matching selection."
                 )
                 continue
 
@@ -94,26 +239,42 @@ def delete_resource_groups(
                 log(f"Skipping deletion {resource_group.name} due to locks.")
                 continue
 
+            matched += 1
             if not live_action:
                 log(f"Skipping deletion {resource_group.name} due to dry run.")
                 continue
             filtered_resource_groups.append(resource_group)
 
-        futures = [
-            executor.submit(
-                delete_resource_group,
-                resource_client,
-                recovery_client,
-                network_client,
-                resource_group,
-                log,
-            )
-            for resource_group in filtered_resource_groups
-        ]
+        if fast_path:
+            futures = [
+                executor.submit(
+                    delete_resource_group_fast,
+                    resource_client,
+                    recovery_client,
+                    backup_client,
+                    resource_group,
+                    log,
+                )
+                for resource_group in filtered_resource_groups
+            ]
+        else:
+            futures = [
+                executor.submit(
+                    delete_resource_group,
+                    resource_client,
+                    recovery_client,
+                    network_client,
+                    resource_group,
+                    log,
+                )
+                for resource_group in filtered_resource_groups
+            ]
 
         for future in futures:
             future.result()
 
+    return matched
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -135,19 +296,57 @@ def main():
     parser.add_argument(
         "--prefix",
         type=str,
-        help="Prefix to filter resource groups by name",
-        default="foobar",
+        help="Prefix to filter resource groups by name. Defaults to foobar "
+        "when no --include is given either",
+    )
+    parser.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="Skip per-NSG deletes, delete recovery vaults and their backup "
+        "items concurrently and force-delete VMs and scale sets",
     )
+    add_selection_arguments(parser)
+    add_pool_arguments(parser)
 
     args = parser.parse_args()
+    if args.prefix is None and not args.include:
+        args.prefix = "foobar"
+    configure_pools(args.num_workers, args.pool_limit)
+
+    # The Azure SDKs are slow to import, so load them only once a command
+    # actually needs them.
+    from azure.identity import DefaultAzureCredential
+    from azure.mgmt.network import NetworkManagementClient
+    from azure.mgmt.recoveryservices import RecoveryServicesClient
+    from azure.mgmt.resource import ResourceManagementClient
+    from azure.mgmt.resource.locks import ManagementLockClient
 
     # Authenticate using the default Azure credentials
     credential = DefaultAzureCredential()
 
-    resource_client = ResourceManagementClient(credential, args.subscription_id)
-    lock_client = ManagementLockClient(credential, args.subscription_id)
-    recovery_client = RecoveryServicesClient(credential, args.subscription_id)
-    network_client = NetworkManagementClient(credential, args.subscription_id)
+    # All management clients share one pooled, keep-alive transport
+    transport = azure_transport()
+    resource_client = ResourceManagementClient(
+        credential, args.subscription_id, transport=transport
+    )
+    lock_client = ManagementLockClient(
+        credential, args.subscription_id, transport=transport
+    )
+    recovery_client = RecoveryServicesClient(
+        credential, args.subscription_id, transport=transport
+    )
+    network_client = NetworkManagementClient(
+        credential, args.subscription_id, transport=transport
+    )
+    backup_client = None
+    if args.fast_path:
+        from azure.mgmt.recoveryservicesbackup.activestamp import (
+            RecoveryServicesBackupClient,
+        )
+
+        backup_client = RecoveryServicesBackupClient(
+            credential, args.subscription_id, transport=transport
+        )
 
     delete_resource_groups(
         resource_client,
@@ -156,7 +355,9 @@ def main():
         network_client,
         args.live_action,
         args.num_workers,
-        args.prefix,
+        selector_from_args(args.prefix, args.include, args.exclude),
+        backup_client,
+        args.fast_path,
     )
 
 
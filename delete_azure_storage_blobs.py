@@ -1,11 +1,13 @@
 import argparse
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.storage import StorageManagementClient
-from azure.storage.blob import BlobServiceClient
+import multiprocessing
 
+from selection import add_selection_arguments, selector_from_args
+from transport import add_pool_arguments, azure_transport, configure_pools
 
-def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
+
+def delete_blobs_in_storage_containers(
+    subscription_id, selector, live_action, credential=None
+):
     if live_action:
         log = print
     else:
@@ -13,12 +15,21 @@ def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
         def log(text):
             return print(f"[DRYRUN] {text}")
 
+    from azure.identity import DefaultAzureCredential
+    from azure.mgmt.resource import ResourceManagementClient
+    from azure.mgmt.storage import StorageManagementClient
+    from azure.storage.blob import BlobServiceClient
+
+    matched = 0
     try:
-        # Create a DefaultAzureCredential object
-        credential = DefaultAzureCredential()
+        # Create a DefaultAzureCredential object unless the caller keeps one
+        if credential is None:
+            credential = DefaultAzureCredential()
 
         # Create a ResourceManagementClient using the default credential
-        resource_client = ResourceManagementClient(credential, subscription_id)
+        resource_client = ResourceManagementClient(
+            credential, subscription_id, transport=azure_transport()
+        )
 
         # List all resource groups in the subscription
         resource_groups = resource_client.resource_groups.list()
@@ -27,7 +38,9 @@ def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
         for resource_group in resource_groups:
             log(f"Scanning resource group {resource_group.name}")
             # Create a StorageManagementClient using the default credential
-            storage_client = StorageManagementClient(credential, subscription_id)
+            storage_client = StorageManagementClient(
+                credential, subscription_id, transport=azure_transport()
+            )
 
             # List all storage accounts in the resource group
             storage_accounts = storage_client.storage_accounts.list_by_resource_group(
@@ -42,9 +55,11 @@ def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
                 )
 
                 # Create a BlobServiceClient using the account name and key
+                blob_endpoint = f"{account.name}.blob.core.windows.net"
                 blob_service_client = BlobServiceClient(
-                    account_url=f"https://{account.name}.blob.core.windows.net",
+                    account_url=f"https://{blob_endpoint}",
                     credential=keys.keys[0].value,
+                    transport=azure_transport(blob_endpoint),
                 )
 
                 # List containers in the storage account
@@ -57,10 +72,15 @@ def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
                         container.name
                     )
 
-                    # List blobs with the specified prefix in the container
-                    blob_list = container_client.list_blobs(name_starts_with=prefix)
+                    # List blobs with the selection's common prefix in the container
+                    blob_list = container_client.list_blobs(
+                        name_starts_with=selector.list_prefix or None
+                    )
                     # Print the name of each blob
                     for blob in blob_list:
+                        if not selector(blob.name):
+                            continue
+                        matched += 1
                         log(
                             f"Deleting blob {account.name}/{container.name}/{blob.name}"
                         )
@@ -70,6 +90,7 @@ def delete_blobs_in_storage_containers(subscription_id, prefix, live_action):
 
     except Exception as e:
         log(f"Error: {e}")
+    return matched
 
 
 def main():
@@ -78,22 +99,25 @@ def main():
     )
     parser.add_argument("--subscription_id", help="Azure subscription ID")
     parser.add_argument("--prefix", help="Prefix to filter containers")
+    add_selection_arguments(parser)
+    add_pool_arguments(parser)
     parser.add_argument(
         "--live-action", action="store_true", help="Perform deletion action on blobs"
     )
 
     args = parser.parse_args()
+    # Blobs are deleted one at a time, so only --pool-limit overrides apply
+    configure_pools(multiprocessing.cpu_count(), args.pool_limit)
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
 
-    delete_blobs_in_storage_containers(
-        args.subscription_id, args.prefix, args.live_action
-    )
+    delete_blobs_in_storage_containers(args.subscription_id, selector, args.live_action)
 
     if not args.live_action:
         rerun_live = input("Do you want to rerun in live mode? (Y/N): ").strip().lower()
         if rerun_live == "y":
             args.live_action = True
             delete_blobs_in_storage_containers(
-                args.subscription_id, args.prefix, args.live_action
+                args.subscription_id, selector, args.live_action
             )
 
 
@@ -1,9 +1,10 @@
 import argparse
-import boto3
 import json
 
 
 def export_role_permissions(role_name):
+    import boto3
+
     # Initialize IAM client for the source account
     source_iam = boto3.client("iam")
 
@@ -1,9 +1,10 @@
 import argparse
-import boto3
 import json
 
 
 def import_role_permissions(role_name):
+    import boto3
+
     # Initialize IAM client for the target account
     target_iam = boto3.client("iam")
 
@@ -0,0 +1,188 @@
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    name TEXT,
+    state TEXT,
+    created_at REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_action TEXT,
+    last_action_at REAL,
+    attributes TEXT,
+    PRIMARY KEY (account, region, resource_type, resource_id)
+);
+CREATE INDEX IF NOT EXISTS resources_by_type_state
+    ON resources (account, region, resource_type, state);
+CREATE TABLE IF NOT EXISTS resource_refs (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    ref_id TEXT NOT NULL,
+    PRIMARY KEY (account, region, resource_type, resource_id, ref_id)
+);
+CREATE INDEX IF NOT EXISTS resource_refs_by_ref
+    ON resource_refs (account, region, ref_id);
+CREATE TABLE IF NOT EXISTS scans (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (account, region, resource_type)
+);
+"""
+
+# A recorded action no longer applies once the resource was created after it
+# (recreated under the same id), or, when the API exposes no creation time,
+# once a later scan still returns it.
+ACTION_SUPERSEDED = (
+    "resources.last_action_at IS NOT NULL AND (excluded.created_at IS NULL"
+    " OR excluded.created_at > resources.last_action_at)"
+)
+
+
+class Inventory:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def last_scan(self, account, region, resource_type):
+        row = self.conn.execute(
+            "SELECT scanned_at FROM scans"
+            " WHERE account = ? AND region = ? AND resource_type = ?",
+            (account, region, resource_type),
+        ).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, account, region, resource_type, max_age):
+        scanned_at = self.last_scan(account, region, resource_type)
+        return scanned_at is not None and time.time() - scanned_at < max_age
+
+    def record_scan(self, account, region, resource_type, resources):
+        # resources: dicts with "id" and optional "name", "state",
+        # "created_at" (epoch seconds), "refs" and "attributes".
+        # Returns ids created since the previous scan, falling back to ids not
+        # seen before when the API does not expose a creation time.
+        now = time.time()
+        with self.lock, self.conn:
+            previous_scan = self.last_scan(account, region, resource_type)
+            known = {
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT resource_id FROM resources"
+                    " WHERE account = ? AND region = ? AND resource_type = ?",
+                    (account, region, resource_type),
+                )
+            }
+            new_ids = []
+            for resource in resources:
+                created_at = resource.get("created_at")
+                if created_at is not None and previous_scan is not None:
+                    if created_at > previous_scan:
+                        new_ids.append(resource["id"])
+                elif resource["id"] not in known:
+                    new_ids.append(resource["id"])
+
+            self.conn.executemany(
+                "INSERT INTO resources (account, region, resource_type,"
+                " resource_id, name, state, created_at, first_seen, last_seen,"
+                " attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (account, region, resource_type, resource_id)"
+                " DO UPDATE SET name = excluded.name, state = excluded.state,"
+                " created_at = excluded.created_at,"
+                " last_seen = excluded.last_seen,"
+                " attributes = excluded.attributes,"
+                f" last_action = CASE WHEN {ACTION_SUPERSEDED} THEN NULL"
+                " ELSE resources.last_action END,"
+                f" last_action_at = CASE WHEN {ACTION_SUPERSEDED} THEN NULL"
+                " ELSE resources.last_action_at END",
+                [
+                    (
+                        account,
+                        region,
+                        resource_type,
+                        resource["id"],
+                        resource.get("name"),
+                        resource.get("state"),
+                        resource.get("created_at"),
+                        now,
+                        now,
+                        json.dumps(resource.get("attributes", {}), default=str),
+                    )
+                    for resource in resources
+                ],
+            )
+            # Anything not returned by this scan no longer exists
+            self.conn.execute(
+                "DELETE FROM resources WHERE account = ? AND region = ?"
+                " AND resource_type = ? AND last_seen < ?",
+                (account, region, resource_type, now),
+            )
+            self.conn.execute(
+                "DELETE FROM resource_refs WHERE account = ? AND region = ?"
+                " AND resource_type = ?",
+                (account, region, resource_type),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO resource_refs VALUES (?, ?, ?, ?, ?)",
+                [
+                    (account, region, resource_type, resource["id"], ref_id)
+                    for resource in resources
+                    for ref_id in resource.get("refs", ())
+                ],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?)",
+                (account, region, resource_type, now),
+            )
+        return new_ids
+
+    def record_action(self, account, region, resource_type, resource_id, action):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE resources SET last_action = ?, last_action_at = ?"
+                " WHERE account = ? AND region = ? AND resource_type = ?"
+                " AND resource_id = ?",
+                (action, time.time(), account, region, resource_type, resource_id),
+            )
+
+    def resource_ids(self, account, region, resource_type, state=None):
+        query = (
+            "SELECT resource_id FROM resources"
+            " WHERE account = ? AND region = ? AND resource_type = ?"
+            " AND last_action IS NOT 'deleted'"
+        )
+        params = [account, region, resource_type]
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def unreferenced_ids(self, account, region, resource_type):
+        # Ids of resource_type that no other resource in the region refers to
+        return [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT r.resource_id FROM resources r"
+                " WHERE r.account = ? AND r.region = ? AND r.resource_type = ?"
+                " AND r.last_action IS NOT 'deleted'"
+                " AND NOT EXISTS (SELECT 1 FROM resource_refs f"
+                " WHERE f.account = r.account AND f.region = r.region"
+                " AND f.ref_id = r.resource_id)",
+                (account, region, resource_type),
+            )
+        ]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from boto3_client import (
+    assumed_role_session,
+    ec2_client_iterator,
+    organization_account_ids,
+    s3_client_iterator,
+)
+from delete_amis import delete_amis, list_amis
+from delete_aws_cloud_trails import delete_cloudtrails_global
+from delete_aws_keypairs import delete_key_pairs
+from delete_aws_resources import delete_aws_resources
+from delete_aws_s3_objects import delete_buckets
+from selection import add_selection_arguments, selector_from_args
+from transport import add_pool_arguments, configure_pools
+
+
+def sweep_amis(session, account_id, selector, args):
+    return sum(
+        delete_amis(
+            ec2_client,
+            region,
+            list_amis(ec2_client, account_id),
+            selector,
+            args.live_action,
+        )
+        for ec2_client, region in ec2_client_iterator(session)
+    )
+
+
+def sweep_keypairs(session, account_id, selector, args):
+    return sum(
+        delete_key_pairs(ec2_client, region, selector, args.live_action)
+        for ec2_client, region in ec2_client_iterator(session)
+    )
+
+
+def sweep_cloudtrails(session, account_id, selector, args):
+    return delete_cloudtrails_global(
+        selector, args.live_action, args.num_workers, session=session
+    )
+
+
+def sweep_s3(session, account_id, selector, args):
+    return sum(
+        delete_buckets(s3_client, selector, args.live_action, args.num_workers)
+        for s3_client in s3_client_iterator(session)
+    )
+
+
+def sweep_resources(session, account_id, selector, args):
+    # delete_aws_resources has no dry-run mode
+    if not args.live_action:
+        print(f"[DRYRUN] {account_id} Skipping unused resources sweep ...")
+        return 0
+    return delete_aws_resources(session=session)
+
+
+SWEEPS = {
+    "amis": sweep_amis,
+    "keypairs": sweep_keypairs,
+    "cloudtrails": sweep_cloudtrails,
+    "s3": sweep_s3,
+    "resources": sweep_resources,
+}
+
+
+def sweep_account(account_id, args):
+    # Runs in a worker process; each process keeps its own STS credential cache
+    # and connection pools.
+    configure_pools(args.num_workers, args.pool_limit)
+    result = {"account": account_id, "sweeps": {}}
+    try:
+        session = assumed_role_session(account_id, args.role_name)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    selector = selector_from_args(args.prefix, args.include, args.exclude)
+    for name in args.sweeps:
+        start = time.monotonic()
+        sweep_result = {}
+        try:
+            sweep_result["matched"] = SWEEPS[name](session, account_id, selector, args)
+        except Exception as e:
+            sweep_result["error"] = str(e)
+        sweep_result["seconds"] = round(time.monotonic() - start, 2)
+        result["sweeps"][name] = sweep_result
+    return result
+
+
+def print_report(results):
+    for result in sorted(results, key=lambda result: result["account"]):
+        if "error" in result:
+            print(f"{result['account']} FAILED: {result['error']}")
+            continue
+        for name, sweep_result in result["sweeps"].items():
+            if "error" in sweep_result:
+                status = f"FAILED: {sweep_result['error']}"
+            else:
+                status = f"{sweep_result['matched']} matched"
+            print(
+                f"{result['account']} {name}: {status} " f"({sweep_result['seconds']}s)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run AWS sweeps across many accounts using assumed roles"
+    )
+    accounts = parser.add_mutually_exclusive_group(required=True)
+    accounts.add_argument("--accounts", nargs="+", help="Account IDs to sweep")
+    accounts.add_argument(
+        "--ou", help="Organizational unit (or root) ID whose accounts to sweep"
+    )
+    parser.add_argument(
+        "--role-name",
+        default="OrganizationAccountAccessRole",
+        help="Role to assume in each account",
+    )
+    parser.add_argument(
+        "--sweeps",
+        nargs="+",
+        choices=sorted(SWEEPS),
+        default=["amis", "keypairs", "cloudtrails"],
+        help="Sweeps to run in each account",
+    )
+    parser.add_argument("--prefix", help="Prefix to check for in resource names")
+    add_selection_arguments(parser)
+    add_pool_arguments(parser)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of accounts swept in parallel, one worker process each",
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker threads per account for S3 deletions",
+    )
+    parser.add_argument("--report", help="Write the aggregated report as JSON here")
+    parser.add_argument(
+        "--live-action",
+        action="store_true",
+        help="Perform live actions instead of dry run",
+    )
+    args = parser.parse_args()
+    if not args.prefix and not args.include:
+        parser.error("a --prefix or --include selection is required")
+
+    account_ids = args.accounts or organization_account_ids(args.ou)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [
+            executor.submit(sweep_account, account_id, args)
+            for account_id in account_ids
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    print_report(results)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(results, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote_plus, urlparse
+
+CHUNK_SIZE = 1000
+
+
+def is_s3_uri(location):
+    return location.startswith("s3://")
+
+
+def split_s3_uri(uri):
+    parsed = urlparse(uri)
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+def read_manifest(location, s3_client=None):
+    if is_s3_uri(location):
+        bucket, key = split_s3_uri(location)
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return json.loads(body)
+    with open(location) as manifest_file:
+        return json.load(manifest_file)
+
+
+def resolve_local_data_file(manifest_location, file_key):
+    # Local fixtures mirror the destination bucket layout; find the directory
+    # that the manifest's file keys are relative to.
+    directory = os.path.dirname(os.path.abspath(manifest_location))
+    while True:
+        candidate = os.path.join(directory, file_key)
+        if os.path.exists(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return os.path.join(
+        os.path.dirname(os.path.abspath(manifest_location)),
+        os.path.basename(file_key),
+    )
+
+
+def open_data_file(manifest, manifest_location, file_key, s3_client=None):
+    if is_s3_uri(manifest_location):
+        destination_bucket = manifest["destinationBucket"].split(":::")[-1]
+        return s3_client.get_object(Bucket=destination_bucket, Key=file_key)["Body"]
+    return open(resolve_local_data_file(manifest_location, file_key), "rb")
+
+
+def cutoff_timestamp(older_than_days):
+    if older_than_days is None:
+        return None
+    return datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+
+def iter_csv_chunks(stream, schema, selector, cutoff, chunk_size):
+    key_index = schema.index("Key")
+    version_index = schema.index("VersionId") if "VersionId" in schema else None
+    modified_index = (
+        schema.index("LastModifiedDate") if "LastModifiedDate" in schema else None
+    )
+    # Inventory timestamps share one ISO-8601 format, so string comparison
+    # against a cutoff formatted the same way avoids parsing every row.
+    cutoff_text = (
+        cutoff.strftime("%Y-%m-%dT%H:%M:%S.000Z") if cutoff is not None else None
+    )
+
+    reader = csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=stream), "utf-8"))
+    chunk = []
+    for row in reader:
+        if cutoff_text is not None and modified_index is not None:
+            if row[modified_index] >= cutoff_text:
+                continue
+        # CSV inventory reports URL-encode object keys
+        key = unquote_plus(row[key_index])
+        if selector is not None and not selector(key):
+            continue
+        obj = {"Key": key}
+        if version_index is not None and row[version_index]:
+            obj["VersionId"] = row[version_index]
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_parquet_chunks(stream, schema, selector, cutoff, chunk_size):
+    try:
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Reading Parquet inventory reports requires pyarrow to be installed"
+        ) from e
+
+    columns = [column for column in ("Key", "VersionId") if column in schema]
+    if cutoff is not None and "LastModifiedDate" in schema:
+        columns.append("LastModifiedDate")
+
+    if stream.seekable():
+        yield from iter_parquet_file_chunks(
+            pq.ParquetFile(stream), pc, columns, selector, cutoff, chunk_size
+        )
+        return
+    # Parquet needs random access; spool S3 bodies to disk instead of memory
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(stream, spool, 1024 * 1024)
+        spool.seek(0)
+        yield from iter_parquet_file_chunks(
+            pq.ParquetFile(spool), pc, columns, selector, cutoff, chunk_size
+        )
+
+
+def iter_parquet_file_chunks(parquet_file, pc, columns, selector, cutoff, chunk_size):
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        mask = None
+        if selector is not None and selector.list_prefix:
+            mask = pc.starts_with(batch.column("Key"), selector.list_prefix)
+        if "LastModifiedDate" in columns:
+            modified = batch.column("LastModifiedDate")
+            if getattr(modified.type, "tz", None) is None:
+                # Naive timestamps in inventory reports are UTC
+                older = pc.less(modified, cutoff.replace(tzinfo=None))
+            else:
+                older = pc.less(modified, cutoff)
+            mask = older if mask is None else pc.and_(mask, older)
+        if mask is not None:
+            batch = batch.filter(mask)
+        if not batch.num_rows:
+            continue
+        keys = batch.column("Key").to_pylist()
+        if "VersionId" in columns:
+            versions = batch.column("VersionId").to_pylist()
+        else:
+            versions = [None] * len(keys)
+        chunk = [
+            {"Key": key, "VersionId": version} if version else {"Key": key}
+            for key, version in zip(keys, versions)
+            if selector is None or selector(key)
+        ]
+        if chunk:
+            yield chunk
+
+
+def iter_inventory_chunks(
+    manifest_location,
+    selector=None,
+    older_than_days=None,
+    s3_client=None,
+    chunk_size=CHUNK_SIZE,
+):
+    manifest = read_manifest(manifest_location, s3_client)
+    file_format = manifest["fileFormat"]
+    if file_format == "CSV":
+        iter_chunks = iter_csv_chunks
+    elif file_format == "Parquet":
+        iter_chunks = iter_parquet_chunks
+    else:
+        raise ValueError(f"Unsupported inventory file format: {file_format}")
+
+    schema = [column.strip() for column in manifest["fileSchema"].split(",")]
+    # Without modification dates an age limit cannot be honoured; refuse
+    # rather than select every object regardless of age
+    if older_than_days is not None and "LastModifiedDate" not in schema:
+        raise ValueError(
+            "Inventory report has no LastModifiedDate column to apply "
+            "older_than_days to"
+        )
+    cutoff = cutoff_timestamp(older_than_days)
+    for data_file in manifest["files"]:
+        with open_data_file(
+            manifest, manifest_location, data_file["key"], s3_client
+        ) as stream:
+            yield from iter_chunks(stream, schema, selector, cutoff, chunk_size)
+
+
+def source_bucket(manifest_location, s3_client=None):
+    return read_manifest(manifest_location, s3_client)["sourceBucket"]
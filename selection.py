@@ -0,0 +1,159 @@
+import argparse
+import bisect
+import fnmatch
+import os
+import re
+
+# Patterns are "prefix:<text>", "glob:<pattern>" or "re:<regex>"; anything
+# without a recognised kind is a prefix. Regexes are anchored at the start of
+# the name like re.match.
+PATTERN_KINDS = ("prefix", "glob", "re")
+
+
+def parse_pattern(pattern):
+    kind, separator, value = pattern.partition(":")
+    if separator and kind in PATTERN_KINDS:
+        return kind, value
+    return "prefix", pattern
+
+
+def compile_pattern(pattern):
+    kind, value = parse_pattern(pattern)
+    if kind == "prefix":
+        return None
+    try:
+        return re.compile(fnmatch.translate(value) if kind == "glob" else value)
+    except re.error as e:
+        raise ValueError(f"invalid pattern {pattern!r}: {e}") from None
+
+
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+def combinable(compiled):
+    # Regexes with global inline flags such as (?i) or with groups (which
+    # backreferences may number or name) change meaning inside a larger
+    # alternation, so only plain ones are merged.
+    return compiled.groups == 0 and compiled.flags == _DEFAULT_FLAGS
+
+
+class PatternSet:
+    def __init__(self, patterns):
+        prefixes = []
+        regexes = []
+        self.separate_regexes = []
+        for pattern in patterns:
+            compiled = compile_pattern(pattern)
+            if compiled is None:
+                prefixes.append(parse_pattern(pattern)[1])
+            elif combinable(compiled):
+                regexes.append(compiled.pattern)
+            else:
+                self.separate_regexes.append(compiled)
+
+        # Drop prefixes made redundant by a shorter one. What remains is
+        # prefix-free, so the only candidate for a name is its sorted
+        # predecessor and lookups cost one bisect regardless of pattern count.
+        self.prefixes = []
+        for prefix in sorted(set(prefixes)):
+            if not self.prefixes or not prefix.startswith(self.prefixes[-1]):
+                self.prefixes.append(prefix)
+        self.match_all = self.prefixes == [""]
+
+        # The other globs and regexes are combined into a single compiled
+        # pattern
+        self.regex = (
+            re.compile("|".join(f"(?:{regex})" for regex in regexes))
+            if regexes
+            else None
+        )
+        self.literal = not regexes and not self.separate_regexes
+
+    def __bool__(self):
+        return (
+            bool(self.prefixes) or self.regex is not None or bool(self.separate_regexes)
+        )
+
+    def matches(self, name):
+        if self.match_all:
+            return True
+        if self.prefixes:
+            index = bisect.bisect_right(self.prefixes, name) - 1
+            if index >= 0 and name.startswith(self.prefixes[index]):
+                return True
+        if self.regex is not None and self.regex.match(name) is not None:
+            return True
+        return any(regex.match(name) for regex in self.separate_regexes)
+
+
+class Selector:
+    def __init__(self, includes=(), excludes=()):
+        self.includes = PatternSet(includes)
+        self.excludes = PatternSet(excludes)
+        self.list_prefix = common_literal_prefix(includes)
+
+    def __call__(self, name):
+        if self.includes and not self.includes.matches(name):
+            return False
+        return not (self.excludes and self.excludes.matches(name))
+
+    def literal_prefixes(self):
+        # Plain prefixes for APIs that only filter by prefix, or None when the
+        # selection cannot be expressed that way.
+        if self.excludes or not self.includes.literal:
+            return None
+        return self.includes.prefixes or [""]
+
+
+def literal_head(pattern):
+    kind, value = parse_pattern(pattern)
+    if kind == "prefix":
+        return value
+    if kind == "glob":
+        return re.split(r"[*?\[]", value, maxsplit=1)[0]
+    # Only a leading run of plain characters is a safe literal for regexes,
+    # minus its last character which a quantifier may make optional.
+    if "|" in value:
+        return ""
+    return re.match(r"[\w/\- ]*", value).group()[:-1]
+
+
+def common_literal_prefix(includes):
+    # Longest prefix every included name must start with, usable as a
+    # server-side listing filter.
+    if not includes:
+        return ""
+    return os.path.commonprefix([literal_head(pattern) for pattern in includes])
+
+
+def selector_from_args(prefix, includes, excludes):
+    # The legacy single prefix is always a literal prefix
+    patterns = [f"prefix:{prefix}"] if prefix else []
+    return Selector(patterns + list(includes or []), excludes or [])
+
+
+def selection_pattern(pattern):
+    # argparse type, so a bad pattern is reported against its argument
+    try:
+        compile_pattern(pattern)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return pattern
+
+
+def add_selection_arguments(parser):
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        type=selection_pattern,
+        help="Select names matching this pattern (prefix:, glob: or re:; "
+        "plain text is a prefix). May be repeated",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        type=selection_pattern,
+        help="Never select names matching this pattern. May be repeated",
+    )
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from selection import add_selection_arguments, selector_from_args
+from transport import add_pool_arguments, configure_pools
+
+AWS_SWEEPS = ("amis", "keypairs", "cloudtrails", "s3", "resources")
+AZURE_SWEEPS = ("azure_resource_groups", "azure_blobs")
+
+
+class SweepSchedule:
+    def __init__(self, name, interval, min_interval, max_interval):
+        self.name = name
+        self.base_interval = interval
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.next_run = time.time()
+        self.state = "idle"
+        self.runs = 0
+        self.last_started = None
+        self.last_seconds = None
+        self.last_matched = None
+        self.last_error = None
+
+    def reschedule(self, jitter):
+        # Sweeps that found something run again sooner; quiet ones back off
+        if self.last_matched:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+        self.next_run = time.time() + self.interval * random.uniform(
+            1 - jitter, 1 + jitter
+        )
+
+    def status(self):
+        return {
+            "state": self.state,
+            "interval": round(self.interval, 1),
+            "next_run_in": round(max(0, self.next_run - time.time()), 1),
+            "runs": self.runs,
+            "last_started": self.last_started,
+            "last_seconds": self.last_seconds,
+            "last_matched": self.last_matched,
+            "last_error": self.last_error,
+        }
+
+
+class SweeperDaemon:
+    def __init__(self, args):
+        self.args = args
+        self.selector = selector_from_args(args.prefix, args.include, args.exclude)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.schedules = {}
+        for name in args.sweeps:
+            interval = dict(args.interval_for).get(name, args.interval)
+            self.schedules[name] = SweepSchedule(
+                name,
+                interval,
+                min(interval, args.min_interval),
+                max(interval, args.max_interval),
+            )
+        self._account_id = None
+        self._azure_clients = None
+
+    # Warm state, created on first use and kept for the life of the daemon
+
+    def account_id(self):
+        if self._account_id is None:
+            import boto3
+
+            from boto3_client import create_client
+
+            self._account_id = create_client(boto3, "sts").get_caller_identity()[
+                "Account"
+            ]
+        return self._account_id
+
+    def azure_clients(self):
+        if self._azure_clients is None:
+            from azure.identity import DefaultAzureCredential
+            from azure.mgmt.network import NetworkManagementClient
+            from azure.mgmt.recoveryservices import RecoveryServicesClient
+            from azure.mgmt.resource import ResourceManagementClient
+            from azure.mgmt.resource.locks import ManagementLockClient
+
+            from transport import azure_transport
+
+            credential = DefaultAzureCredential()
+            subscription_id = self.args.azure_subscription_id
+            transport = azure_transport()
+            self._azure_clients = {
+                "credential": credential,
+                "resource": ResourceManagementClient(
+                    credential, subscription_id, transport=transport
+                ),
+                "lock": ManagementLockClient(
+                    credential, subscription_id, transport=transport
+                ),
+                "recovery": RecoveryServicesClient(
+                    credential, subscription_id, transport=transport
+                ),
+                "network": NetworkManagementClient(
+                    credential, subscription_id, transport=transport
+                ),
+            }
+        return self._azure_clients
+
+    def run_sweep(self, name):
+        if name in AWS_SWEEPS:
+            from multi_account import SWEEPS
+
+            return SWEEPS[name](None, self.account_id(), self.selector, self.args)
+
+        clients = self.azure_clients()
+        if name == "azure_resource_groups":
+            from delete_azure_resources import delete_resource_groups
+
+            return delete_resource_groups(
+                clients["resource"],
+                clients["lock"],
+                clients["recovery"],
+                clients["network"],
+                self.args.live_action,
+                self.args.num_workers,
+                self.selector,
+            )
+
+        from delete_azure_storage_blobs import delete_blobs_in_storage_containers
+
+        return delete_blobs_in_storage_containers(
+            self.args.azure_subscription_id,
+            self.selector,
+            self.args.live_action,
+            clients["credential"],
+        )
+
+    def execute(self, schedule):
+        with self.lock:
+            schedule.state = "running"
+            schedule.last_started = time.time()
+        start = time.monotonic()
+        matched, error = None, None
+        try:
+            matched = self.run_sweep(schedule.name)
+        except Exception as e:
+            error = str(e)
+            print(f"Sweep {schedule.name} failed: {e}")
+        with self.lock:
+            schedule.runs += 1
+            schedule.last_seconds = round(time.monotonic() - start, 2)
+            schedule.last_matched = matched
+            schedule.last_error = error
+            schedule.reschedule(self.args.jitter)
+            schedule.state = "idle"
+
+    def status(self):
+        with self.lock:
+            return {
+                "queue_depth": sum(
+                    schedule.state == "queued" for schedule in self.schedules.values()
+                ),
+                "sweeps": {
+                    name: schedule.status() for name, schedule in self.schedules.items()
+                },
+            }
+
+    def run_forever(self):
+        executor = ThreadPoolExecutor(max_workers=self.args.concurrency)
+        try:
+            while not self.stopped.is_set():
+                now = time.time()
+                with self.lock:
+                    due = [
+                        schedule
+                        for schedule in self.schedules.values()
+                        if schedule.state == "idle" and schedule.next_run <= now
+                    ]
+                    for schedule in due:
+                        schedule.state = "queued"
+                    next_run = min(
+                        (
+                            schedule.next_run
+                            for schedule in self.schedules.values()
+                            if schedule.state == "idle"
+                        ),
+                        default=now + 1,
+                    )
+                for schedule in due:
+                    executor.submit(self.execute, schedule)
+                self.stopped.wait(min(max(next_run - now, 0.1), 1))
+        except KeyboardInterrupt:
+            self.stopped.set()
+        finally:
+            # Sweeps already running can take hours; drop queued ones and
+            # leave running ones to die with the process
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def serve_status(daemon, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/status"):
+                self.send_error(404)
+                return
+            body = json.dumps(daemon.status(), indent=2).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_interval_for(value):
+    name, _, seconds = value.partition("=")
+    return name, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run AWS and Azure sweeps continuously on a schedule",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--sweeps",
+        nargs="+",
+        choices=AWS_SWEEPS + AZURE_SWEEPS,
+        default=["amis", "keypairs", "cloudtrails"],
+        help="Resource types to sweep",
+    )
+    parser.add_argument("--azure-subscription-id", help="Azure Subscription ID")
+    parser.add_argument("--prefix", help="Prefix to check for in resource names")
+    add_selection_arguments(parser)
+    parser.add_argument(
+        "--interval", type=float, default=3600, help="Initial seconds between sweeps"
+    )
+    parser.add_argument(
+        "--interval-for",
+        type=parse_interval_for,
+        action="append",
+        default=[],
+        metavar="SWEEP=SECONDS",
+        help="Initial interval for one sweep. May be repeated",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=300,
+        help="Shortest interval for sweeps that keep finding resources",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=6 * 3600,
+        help="Longest interval for sweeps that find nothing",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.1,
+        help="Random fraction added to or removed from each interval",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=2, help="Sweeps allowed to run at once"
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker threads within a sweep",
+    )
+    add_pool_arguments(parser)
+    parser.add_argument(
+        "--status-port",
+        type=int,
+        default=8089,
+        help="Port on 127.0.0.1 serving JSON status at /status",
+    )
+    parser.add_argument(
+        "--live-action",
+        action="store_true",
+        help="Perform live actions instead of dry run",
+    )
+    args = parser.parse_args()
+
+    if not args.prefix and not args.include:
+        parser.error("a --prefix or --include selection is required")
+    if set(args.sweeps) & set(AZURE_SWEEPS) and not args.azure_subscription_id:
+        parser.error("Azure sweeps require --azure-subscription-id")
+
+    configure_pools(args.num_workers, args.pool_limit)
+    daemon = SweeperDaemon(args)
+    server = serve_status(daemon, args.status_port)
+    print(f"Status available at http://127.0.0.1:{args.status_port}/status")
+    try:
+        daemon.run_forever()
+    finally:
+        server.shutdown()
+    # Exiting normally would join the executor's threads and so still wait
+    # for the sweeps that are running
+    print("Stopped, abandoning running sweeps")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import pytest
+
+from delete_aws_s3_objects import (
+    discover_split_points,
+    iter_key_range_pages,
+    key_before,
+)
+from selection import Selector
+
+KEYS = sorted(
+    [f"{top}/{sub}/{index}" for top in "abcd" for sub in "xy" for index in range(3)]
+    + ["root"]
+)
+
+
+class StubPaginator:
+    # Mimics list_objects_v2 pagination over KEYS, including delimiters
+    def __init__(self, keys, page_size=5):
+        self.keys = keys
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix="", Delimiter=None, StartAfter=None):
+        keys = [
+            key
+            for key in self.keys
+            if key.startswith(Prefix) and (StartAfter is None or key > StartAfter)
+        ]
+        if Delimiter:
+            prefixes = sorted(
+                {
+                    Prefix + key[len(Prefix) :].split(Delimiter)[0] + Delimiter
+                    for key in keys
+                    if Delimiter in key[len(Prefix) :]
+                }
+            )
+            yield {"CommonPrefixes": [{"Prefix": prefix} for prefix in prefixes]}
+            return
+        for start in range(0, len(keys), self.page_size):
+            yield {
+                "Contents": [
+                    {"Key": key} for key in keys[start : start + self.page_size]
+                ]
+            }
+
+
+class StubS3Client:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return StubPaginator(self.keys)
+
+
+@pytest.mark.parametrize("key", ["a", "ab", "a/b", "zé", "a\x00"])
+def test_key_before_sorts_just_below_key(key):
+    before = key_before(key)
+    assert before < key
+    # No other key of a bucket falls between the two
+    for other in ["a", "a\x00", "aa", "ab/", "a/a", "a/c", "z", "é"]:
+        if other != key:
+            assert not before < other < key
+
+
+def test_split_points_partition_top_level_prefixes():
+    client = StubS3Client(KEYS)
+    assert discover_split_points(client, "bucket", "", 2) == ["c/"]
+    assert discover_split_points(client, "bucket", "", 4) == ["b/", "c/", "d/"]
+
+
+def test_split_points_descend_until_enough_prefixes():
+    client = StubS3Client(KEYS)
+    assert discover_split_points(client, "bucket", "a/", 2) == ["a/y/"]
+    assert discover_split_points(client, "bucket", "", 8) == [
+        "a/y/",
+        "b/x/",
+        "b/y/",
+        "c/x/",
+        "c/y/",
+        "d/x/",
+        "d/y/",
+    ]
+
+
+def test_split_points_without_prefixes(capsys):
+    client = StubS3Client(["flat-1", "flat-2"])
+    assert discover_split_points(client, "bucket", "", 4) == []
+    assert "No '/' prefixes" in capsys.readouterr().out
+
+
+def list_range(client, selector, lower, upper):
+    return [
+        obj["Key"]
+        for page in iter_key_range_pages(client, "bucket", selector, lower, upper)
+        for obj in page
+    ]
+
+
+@pytest.mark.parametrize("shards", [2, 3, 4, 8, 16])
+def test_key_ranges_cover_every_key_exactly_once(shards):
+    client = StubS3Client(KEYS)
+    selector = Selector()
+    bounds = [None] + discover_split_points(client, "bucket", "", shards) + [None]
+    listed = []
+    for lower, upper in zip(bounds, bounds[1:]):
+        listed.extend(list_range(client, selector, lower, upper))
+    assert listed == KEYS
+
+
+def test_key_range_applies_selector_and_upper_bound():
+    client = StubS3Client(KEYS)
+    assert list_range(client, Selector(["re:.*/x/"]), "b/", "c/") == [
+        "b/x/0",
+        "b/x/1",
+        "b/x/2",
+    ]
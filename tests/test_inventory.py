@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from inventory import Inventory
+
+ACCOUNT = "123456789012"
+REGION = "us-east-1"
+
+
+@pytest.fixture
+def inventory():
+    inventory = Inventory(":memory:")
+    yield inventory
+    inventory.close()
+
+
+def test_record_scan_reports_new_ids(inventory):
+    assert inventory.record_scan(ACCOUNT, REGION, "eip", [{"id": "a"}]) == ["a"]
+    assert inventory.record_scan(
+        ACCOUNT, REGION, "eip", [{"id": "a"}, {"id": "b"}]
+    ) == ["b"]
+    assert inventory.last_scan(ACCOUNT, REGION, "eip") is not None
+
+
+def test_record_scan_drops_resources_no_longer_returned(inventory):
+    inventory.record_scan(ACCOUNT, REGION, "eip", [{"id": "a"}, {"id": "b"}])
+    inventory.record_scan(ACCOUNT, REGION, "eip", [{"id": "b"}])
+    assert inventory.resource_ids(ACCOUNT, REGION, "eip") == ["b"]
+
+
+def test_resource_ids_by_state(inventory):
+    inventory.record_scan(
+        ACCOUNT,
+        REGION,
+        "volume",
+        [{"id": "vol-1", "state": "available"}, {"id": "vol-2", "state": "in-use"}],
+    )
+    assert inventory.resource_ids(ACCOUNT, REGION, "volume", "available") == ["vol-1"]
+
+
+def test_deleted_id_stays_excluded_on_rescan(inventory):
+    volume = {"id": "vol-1", "created_at": time.time() - 3600}
+    inventory.record_scan(ACCOUNT, REGION, "volume", [volume])
+    inventory.record_action(ACCOUNT, REGION, "volume", "vol-1", "deleted")
+    assert inventory.resource_ids(ACCOUNT, REGION, "volume") == []
+
+    # Deletion is eventually consistent, so the next scan may still see it
+    inventory.record_scan(ACCOUNT, REGION, "volume", [volume])
+    assert inventory.resource_ids(ACCOUNT, REGION, "volume") == []
+
+
+def test_action_cleared_when_resource_recreated(inventory):
+    inventory.record_scan(
+        ACCOUNT, REGION, "volume", [{"id": "vol-1", "created_at": time.time() - 3600}]
+    )
+    inventory.record_action(ACCOUNT, REGION, "volume", "vol-1", "deleted")
+
+    inventory.record_scan(
+        ACCOUNT, REGION, "volume", [{"id": "vol-1", "created_at": time.time() + 1}]
+    )
+    assert inventory.resource_ids(ACCOUNT, REGION, "volume") == ["vol-1"]
+
+
+def test_action_cleared_by_rescan_without_created_at(inventory):
+    inventory.record_scan(ACCOUNT, REGION, "placement_group", [{"id": "pg-1"}])
+    inventory.record_action(ACCOUNT, REGION, "placement_group", "pg-1", "deleted")
+    assert inventory.resource_ids(ACCOUNT, REGION, "placement_group") == []
+
+    inventory.record_scan(ACCOUNT, REGION, "placement_group", [{"id": "pg-1"}])
+    assert inventory.resource_ids(ACCOUNT, REGION, "placement_group") == ["pg-1"]
+
+
+def test_unreferenced_ids(inventory):
+    inventory.record_scan(
+        ACCOUNT, REGION, "image", [{"id": "ami-1", "refs": ["snap-1"]}]
+    )
+    inventory.record_scan(
+        ACCOUNT,
+        REGION,
+        "snapshot",
+        [{"id": "snap-1"}, {"id": "snap-2"}, {"id": "snap-3"}],
+    )
+    inventory.record_action(ACCOUNT, REGION, "snapshot", "snap-3", "deleted")
+    assert inventory.unreferenced_ids(ACCOUNT, REGION, "snapshot") == ["snap-2"]
+
+    # Deregistering the image releases its snapshot
+    inventory.record_scan(ACCOUNT, REGION, "image", [])
+    assert sorted(inventory.unreferenced_ids(ACCOUNT, REGION, "snapshot")) == [
+        "snap-1",
+        "snap-2",
+    ]
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from s3_inventory import iter_inventory_chunks, source_bucket
+from selection import Selector
+
+MANIFEST = os.path.join(
+    os.path.dirname(__file__),
+    "fixtures",
+    "s3_inventory",
+    "src-bucket",
+    "cleanup",
+    "2024-01-01T00-00Z",
+    "manifest.json",
+)
+
+
+def objects(chunks):
+    return [obj for chunk in chunks for obj in chunk]
+
+
+def test_source_bucket():
+    assert source_bucket(MANIFEST) == "src-bucket"
+
+
+def test_csv_without_selection_returns_every_object():
+    assert objects(iter_inventory_chunks(MANIFEST)) == [
+        {"Key": "ci/a b", "VersionId": "v1"},
+        {"Key": "ci/new", "VersionId": "v2"},
+        {"Key": "keep/x"},
+        {"Key": "ci/y"},
+    ]
+
+
+def test_csv_prefix_and_age_selection():
+    assert objects(
+        iter_inventory_chunks(MANIFEST, Selector(["ci/"]), older_than_days=30)
+    ) == [{"Key": "ci/a b", "VersionId": "v1"}, {"Key": "ci/y"}]
+
+
+def test_csv_chunk_size():
+    chunks = list(iter_inventory_chunks(MANIFEST, chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+
+
+def test_parquet_prefix_age_and_versions(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    from datetime import datetime
+
+    os.makedirs(tmp_path / "src-bucket" / "cleanup" / "data")
+    pq.write_table(
+        pa.table(
+            {
+                "Bucket": ["src-bucket"] * 4,
+                "Key": ["ci/a b", "ci/new", "keep/x", "ci/y"],
+                "VersionId": ["v1", "v2", None, None],
+                "LastModifiedDate": [
+                    datetime(2020, 1, 1),
+                    datetime(2999, 1, 1),
+                    datetime(2020, 1, 1),
+                    datetime(2020, 6, 1),
+                ],
+            }
+        ),
+        tmp_path / "src-bucket" / "cleanup" / "data" / "part-0.parquet",
+    )
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "sourceBucket": "src-bucket",
+                "destinationBucket": "arn:aws:s3:::inventory-bucket",
+                "fileFormat": "Parquet",
+                "fileSchema": "Bucket, Key, VersionId, LastModifiedDate",
+                "files": [{"key": "src-bucket/cleanup/data/part-0.parquet"}],
+            }
+        )
+    )
+
+    assert objects(
+        iter_inventory_chunks(str(manifest), Selector(["ci/"]), older_than_days=30)
+    ) == [{"Key": "ci/a b", "VersionId": "v1"}, {"Key": "ci/y"}]
+
+
+def test_age_filter_requires_last_modified_date(tmp_path):
+    with open(MANIFEST) as manifest_file:
+        manifest = json.load(manifest_file)
+    manifest["fileSchema"] = "Bucket, Key, Size"
+    manifest_location = tmp_path / "manifest.json"
+    manifest_location.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError, match="LastModifiedDate"):
+        list(iter_inventory_chunks(str(manifest_location), older_than_days=30))
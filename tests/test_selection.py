@@ -0,0 +1,175 @@
+import argparse
+
+import pytest
+
+from selection import (
+    PatternSet,
+    Selector,
+    add_selection_arguments,
+    common_literal_prefix,
+    literal_head,
+    selector_from_args,
+)
+
+
+def test_redundant_prefixes_are_dropped():
+    patterns = PatternSet(["ci-", "ci-abc", "test", "ci-x", "te"])
+    assert patterns.prefixes == ["ci-", "te"]
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("ci-1", True),
+        ("ci-", True),
+        ("ci", False),
+        ("cj-1", False),
+        ("dev-1", True),
+        ("dev", False),
+        ("devx", False),
+        ("prod-dev-1", False),
+        ("", False),
+    ],
+)
+def test_prefix_matches(name, expected):
+    assert PatternSet(["ci-", "dev-", "ci-nightly-"]).matches(name) is expected
+
+
+def test_empty_prefix_matches_everything():
+    patterns = PatternSet(["", "ci-"])
+    assert patterns.match_all
+    assert patterns.matches("anything")
+
+
+@pytest.mark.parametrize(
+    "pattern, name, expected",
+    [
+        ("glob:*.tmp", "a.tmp", True),
+        ("glob:*.tmp", "a.tmp.bak", False),
+        ("glob:ci-?", "ci-1", True),
+        ("re:ci-\\d+$", "ci-12", True),
+        ("re:ci-\\d+$", "xci-12", False),
+        ("prefix:re:x", "re:xyz", True),
+    ],
+)
+def test_pattern_kinds(pattern, name, expected):
+    assert PatternSet([pattern]).matches(name) is expected
+
+
+def test_plain_regexes_are_combined():
+    patterns = PatternSet(["re:ci-\\d+", "glob:*.tmp", "re:(?:a|b)x"])
+    assert patterns.regex is not None
+    assert patterns.separate_regexes == []
+
+
+@pytest.mark.parametrize(
+    "pattern, name",
+    [
+        ("re:(?i)ci-", "CI-1"),
+        ("re:(x)\\1", "xx"),
+        ("re:(?P<a>y)(?P=a)", "yy"),
+    ],
+)
+def test_flagged_and_grouped_regexes_match_separately(pattern, name):
+    patterns = PatternSet([pattern, "re:(?P<a>z)", "re:plain"])
+    assert len(patterns.separate_regexes) == 2
+    assert patterns.matches(name)
+    assert patterns.matches("z")
+    assert patterns.matches("plain")
+    assert not patterns.matches("other")
+
+
+def test_literal():
+    assert PatternSet(["ci-", "dev-"]).literal
+    assert not PatternSet(["ci-", "glob:*.tmp"]).literal
+    assert not PatternSet(["re:(?i)ci-"]).literal
+
+
+def test_invalid_pattern_names_the_argument():
+    with pytest.raises(ValueError, match="re:\\(bad"):
+        PatternSet(["re:(bad"])
+
+    parser = argparse.ArgumentParser()
+    add_selection_arguments(parser)
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--include", "re:(bad"])
+
+
+def test_selector_excludes_win():
+    selector = Selector(["ci-"], ["ci-keep-"])
+    assert selector("ci-1")
+    assert not selector("ci-keep-1")
+    assert not selector("dev-1")
+
+
+def test_selector_without_includes_selects_everything_not_excluded():
+    selector = Selector([], ["keep"])
+    assert selector("anything")
+    assert not selector("keep-me")
+
+
+def test_literal_prefixes():
+    assert Selector(["ci-", "dev-"]).literal_prefixes() == ["ci-", "dev-"]
+    assert Selector().literal_prefixes() == [""]
+    assert Selector(["ci-"], ["ci-keep"]).literal_prefixes() is None
+    assert Selector(["glob:ci-*"]).literal_prefixes() is None
+
+
+@pytest.mark.parametrize(
+    "pattern, head",
+    [
+        ("ci-", "ci-"),
+        ("prefix:ci-", "ci-"),
+        ("glob:ci-*.tmp", "ci-"),
+        ("glob:ci-?", "ci-"),
+        ("glob:ci-[0-9]", "ci-"),
+        # A quantifier may make the last plain character optional
+        ("re:ci-x?", "ci-"),
+        ("re:ci-x*", "ci-"),
+        ("re:ci/\\d+", "ci"),
+        ("re:ci-a|dev-b", ""),
+        ("re:(?i)ci-", ""),
+        ("re:.*", ""),
+    ],
+)
+def test_literal_head(pattern, head):
+    assert literal_head(pattern) == head
+
+
+@pytest.mark.parametrize(
+    "pattern, name",
+    [
+        ("glob:ci-*.tmp", "ci-a.tmp"),
+        ("re:ci-x?", "ci-"),
+        ("re:ci/\\d+", "ci/12"),
+        ("re:ci-a|dev-b", "dev-b"),
+        ("re:(?i)ci-", "CI-1"),
+    ],
+)
+def test_literal_head_is_a_prefix_of_every_match(pattern, name):
+    # The head becomes a server-side listing filter, so it must never
+    # exclude a name the pattern matches
+    assert PatternSet([pattern]).matches(name)
+    assert name.startswith(literal_head(pattern))
+
+
+def test_common_literal_prefix():
+    assert common_literal_prefix([]) == ""
+    assert common_literal_prefix(["ci/a", "ci/b"]) == "ci/"
+    assert common_literal_prefix(["ci/a", "glob:ci/*.tmp"]) == "ci/"
+    assert common_literal_prefix(["ci/a", "dev/b"]) == ""
+    assert Selector(["ci/a", "ci/b"]).list_prefix == "ci/"
+
+
+def test_selector_from_args_ors_prefix_with_includes():
+    selector = selector_from_args("ci-", ["dev-"], ["ci-keep"])
+    assert selector("ci-1")
+    assert selector("dev-1")
+    assert not selector("ci-keep")
+    assert not selector("prod-1")
+
+
+def test_selector_from_args_prefix_is_literal():
+    selector = selector_from_args("glob:", None, None)
+    assert selector("glob:x")
+    assert not selector("x")
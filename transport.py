@@ -0,0 +1,79 @@
+import argparse
+import multiprocessing
+import threading
+
+# Connection pool sizes shared by every boto3 and Azure client the scripts
+# create. The default follows the configured number of workers so that each
+# worker thread can keep its own connection alive; overrides are keyed by
+# boto3 service name (e.g. "s3") or Azure endpoint host.
+_pool_limits = {"default": max(10, multiprocessing.cpu_count())}
+_azure_transports = {}
+_azure_transports_lock = threading.Lock()
+
+
+def configure_pools(num_workers, pool_limits=()):
+    # pool_limits: (endpoint, limit) pairs as parsed by pool_limit_override
+    _pool_limits["default"] = max(10, num_workers)
+    for endpoint, limit in pool_limits:
+        _pool_limits[endpoint] = limit
+
+
+def pool_limit(endpoint):
+    return _pool_limits.get(endpoint, _pool_limits["default"])
+
+
+def boto3_config(service, **kwargs):
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=pool_limit(service),
+        tcp_keepalive=True,
+        **kwargs,
+    )
+
+
+def azure_transport(endpoint="management.azure.com"):
+    # One requests session per endpoint, shared by every client talking to
+    # it, so keep-alive connections survive across clients and calls.
+    with _azure_transports_lock:
+        transport = _azure_transports.get(endpoint)
+        if transport is None:
+            import requests
+            from azure.core.pipeline.transport import RequestsTransport
+            from requests.adapters import HTTPAdapter
+
+            limit = pool_limit(endpoint)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=limit, pool_maxsize=limit)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            transport = RequestsTransport(session=session, session_owner=False)
+            _azure_transports[endpoint] = transport
+        return transport
+
+
+def pool_limit_override(value):
+    # argparse type, so a malformed override is reported against its argument
+    endpoint, separator, limit = value.partition("=")
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if not endpoint or not separator or limit < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected ENDPOINT=N with N a positive integer, got {value!r}"
+        )
+    return endpoint, limit
+
+
+def add_pool_arguments(parser):
+    parser.add_argument(
+        "--pool-limit",
+        action="append",
+        default=[],
+        type=pool_limit_override,
+        metavar="ENDPOINT=N",
+        help="HTTP connection pool size for a boto3 service or Azure endpoint "
+        "host, overriding the default of one connection per worker. May be "
+        "repeated",
+    )